@@ -24,5 +24,10 @@ if [ $migration_result -ne 0 ]; then
 fi
 
 echo "Migrations applied successfully."
+
+# Gera o schema OpenAPI uma vez aqui, em vez de no primeiro acesso de cada worker
+echo "Building OpenAPI schema..."
+python manage.py build_openapi_schema || echo "WARNING: OpenAPI schema build failed; it will be generated on first request."
+
 echo "Starting Django server..."
 exec "$@"
\ No newline at end of file
@@ -13,4 +13,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jota_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importado após o setup do Django (usa models/settings)
+from news_api.streams import NEWS_STREAM_PATH, NewsStreamApp  # noqa: E402
+
+news_stream_application = NewsStreamApp()
+
+
+async def application(scope, receive, send):
+    # O stream SSE é uma conexão longa: atendido direto, fora do ciclo request/response do Django
+    if scope['type'] == 'http' and scope['path'] == NEWS_STREAM_PATH:
+        await news_stream_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -167,6 +167,11 @@ SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
 
+# Schema OpenAPI pré-gerado (veja news_api/schema.py). APP_VERSION (ex.: o hash do
+# commit, definido no deploy) identifica a versão do código; sem ele, usa-se um hash do fonte.
+APP_VERSION = os.getenv('APP_VERSION', '')
+OPENAPI_SCHEMA_DIR = os.getenv('OPENAPI_SCHEMA_DIR', os.path.join(BASE_DIR, 'openapi'))
+
 # --- Configurações do Celery ---
 # URL do Broker (Redis, RabbitMQ, etc.) - Vem do .env via docker-compose
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://redis:6379/0')
@@ -181,3 +186,80 @@ CELERY_RESULT_SERIALIZER = 'json'      # Formato de serialização dos resultado
 CELERY_TIMEZONE = TIME_ZONE            # Usar o mesmo timezone do Django (UTC)
 CELERY_TASK_TRACK_STARTED = True       # Rastrear quando a task inicia
 CELERY_TASK_TIME_LIMIT = 30 * 60       # Tempo limite para tasks (opcional)
+
+# Ninguém lê o resultado das tasks "fire-and-forget" (e-mail, manutenção).
+# Tasks que precisarem do resultado devem declarar ignore_result=False.
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_ACKS_LATE = True           # Só confirma a mensagem após a execução (entrega at-least-once)
+CELERY_TASK_REJECT_ON_WORKER_LOST = True  # Processo do worker morto (OOM/SIGKILL): mensagem volta para a fila
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # Padrão conservador; cada worker ajusta via --prefetch-multiplier
+
+# Filas dedicadas: um tipo de job lento não deve travar os demais.
+# Cada fila é consumida por um worker próprio no docker-compose.yml.
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = {
+    # Notificações (e-mail): jobs curtos, limitados por I/O
+    'news_api.tasks.send_notification_email_task': {'queue': 'notifications'},
+    'news_api.tasks.send_notification_email_batch_task': {'queue': 'notifications'},
+    # Eventos do stream SSE (notícia publicada): sensíveis a latência, fila própria,
+    # para não esperar atrás de e-mails lentos
+    'news_api.tasks.send_notification_news_published_task': {'queue': 'realtime'},
+    # Processamento de mídia (imagens das notícias): jobs longos, limitados por CPU
+    'news_api.tasks.process_*': {'queue': 'media'},
+    # Manutenção: jobs periódicos/administrativos
+    'jota_project.celery.debug_task': {'queue': 'maintenance'},
+    'news_api.tasks.flush_news_counters_task': {'queue': 'maintenance'},
+    'news_api.tasks.refresh_most_read_task': {'queue': 'maintenance'},
+    'news_api.tasks.update_related_news_task': {'queue': 'maintenance'},
+    'news_api.tasks.refresh_related_news_task': {'queue': 'maintenance'},
+    'news_api.tasks.refresh_archive_counts_task': {'queue': 'maintenance'},
+    'news_api.tasks.purge_news_tombstones_task': {'queue': 'maintenance'},
+    'news_api.tasks.apply_news_count_deltas_task': {'queue': 'maintenance'},
+    'news_api.tasks.reconcile_news_counts_task': {'queue': 'maintenance'},
+}
+
+# Tasks periódicas (executadas pelo serviço 'beat' do docker-compose.yml)
+CELERY_BEAT_SCHEDULE = {
+    'flush-news-counters': {
+        'task': 'news_api.tasks.flush_news_counters_task',
+        'schedule': 60.0,
+    },
+    'refresh-most-read': {
+        'task': 'news_api.tasks.refresh_most_read_task',
+        'schedule': 5 * 60.0,
+    },
+    'refresh-related-news': {
+        'task': 'news_api.tasks.refresh_related_news_task',
+        'schedule': 10 * 60.0,
+    },
+    'reconcile-news-counts': {
+        'task': 'news_api.tasks.reconcile_news_counts_task',
+        'schedule': 15 * 60.0,
+    },
+    'purge-news-tombstones': {
+        'task': 'news_api.tasks.purge_news_tombstones_task',
+        'schedule': 24 * 60 * 60.0,
+    },
+}
+
+# Tempo (em segundos) durante o qual uma task deduplicada concluída não roda de novo.
+CELERY_TASK_DEDUPE_TTL = 24 * 60 * 60
+# Reserva "em execução" de uma task deduplicada: passa do limite de tempo das tasks, então
+# só expira com a task já encerrada (ex.: worker morto) e a mensagem reentregue roda de novo.
+CELERY_TASK_DEDUPE_LEASE = CELERY_TASK_TIME_LIMIT + 60
+
+# --- Cache ---
+# Compartilhado entre web e workers (necessário para a deduplicação de tasks).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_URL', 'redis://redis:6379/1'),
+    }
+}
+
+# Redis usado diretamente (contadores de leitura, rankings, eventos do stream SSE)
+REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/2')
+
+# --- E-mail ---
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@jota.info')
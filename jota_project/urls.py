@@ -19,7 +19,7 @@ from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.conf import settings
 from django.conf.urls.static import static
-from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from news_api.schema import schema_view, ui_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -28,12 +28,12 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
 
-    # URLs do drf-spectacular / Swagger
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    # URLs do drf-spectacular / Swagger (schema pré-gerado, veja news_api/schema.py)
+    path('api/schema/', schema_view, name='schema'),
     # UI do Swagger:
-    path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    path('api/schema/swagger-ui/', ui_view('SpectacularSwaggerView'), name='swagger-ui'),
     # UI do ReDoc (alternativa):
-    path('api/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    path('api/schema/redoc/', ui_view('SpectacularRedocView'), name='redoc'),
 ]
 
 if settings.DEBUG:
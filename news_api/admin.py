@@ -1,3 +1,200 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
+from django.db import transaction
 
-# Register your models here.
+from .lifecycle import delete_news, news_state, publish_news, record_news_change, unpublish_news
+from .models import (
+    User, Vertical, News, Plan, UserPlan, NewsStats, RelatedNews,
+    NewsTombstone, NewsArchiveCount, NewsRevision, OutboxMessage
+)
+from .pagination import ApproximateCountPaginator
+from .revisions import record_revision, revision_document
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Base para tabelas grandes: total da paginação aproximado e sem o
+    COUNT(*) extra do "mostrar todos" do changelist.
+    """
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class ReadOnlyAdminMixin:
+    """
+    Tabelas derivadas (mantidas pelo código): o admin só consulta. Editar ou
+    remover linhas à mão corromperia o histórico/contagens que dependem delas.
+    """
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(User)
+class UserAdmin(LargeTableAdmin, DjangoUserAdmin):
+    list_display = ('username', 'email', 'role', 'plan_name', 'is_staff', 'is_active')
+    list_select_related = ('plan_subscription__plan',)
+    list_filter = ('role', 'is_staff', 'is_active', 'plan_subscription__plan')
+    # Busca por prefixo/igualdade usa os índices únicos; "contém" varreria a tabela
+    search_fields = ('^username', '=email')
+    fieldsets = DjangoUserAdmin.fieldsets + (
+        ("JOTA", {'fields': ('role',)}),
+    )
+    add_fieldsets = DjangoUserAdmin.add_fieldsets + (
+        ("JOTA", {'fields': ('role',)}),
+    )
+
+    @admin.display(description="Plano", ordering='plan_subscription__plan__name')
+    def plan_name(self, obj):
+        try:
+            return obj.plan_subscription.plan.name
+        except UserPlan.DoesNotExist:
+            return None
+
+
+@admin.register(Vertical)
+class VerticalAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'updated_at')
+    search_fields = ('name',)
+    readonly_fields = ('slug',)
+
+
+@admin.register(Plan)
+class PlanAdmin(admin.ModelAdmin):
+    list_display = ('name', 'is_pro_plan', 'updated_at')
+    list_filter = ('is_pro_plan',)
+    search_fields = ('name',)
+    autocomplete_fields = ('allowed_verticals',)
+
+
+@admin.register(News)
+class NewsAdmin(LargeTableAdmin):
+    list_display = ('title', 'status', 'is_pro', 'author', 'publication_date', 'updated_at')
+    list_select_related = ('author',)
+    list_filter = ('status', 'is_pro', 'verticals')
+    search_fields = ('^title',)
+    autocomplete_fields = ('author', 'verticals')
+    readonly_fields = ('updated_at',)
+    actions = ('publish_selected', 'unpublish_selected')
+
+    # Edições e remoções pelo admin passam pelo ciclo de vida (contagens, tombstones,
+    # eventos) e pelo histórico de revisões, como as feitas pela API.
+    # O formulário do admin já roda numa transação: tudo é gravado junto.
+
+    def save_model(self, request, obj, form, change):
+        # O formulário já alterou `obj`: o estado anterior vem do banco (linha travada)
+        obj._lifecycle_before = obj._revision_baseline = None
+        if change:
+            original = News.objects.select_for_update().get(pk=obj.pk)
+            obj._lifecycle_before = news_state(original)
+            obj._revision_baseline = revision_document(original, obj._lifecycle_before['verticals'])
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change) # Grava as verticais
+        news = form.instance
+        after = news_state(news)
+        record_news_change(news.id, news._lifecycle_before, after)
+        record_revision(
+            news, revision_document(news, after['verticals']),
+            author=request.user, baseline=news._revision_baseline,
+        )
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            before = news_state(obj)
+            news_id = obj.id
+            super().delete_model(request, obj)
+            record_news_change(news_id, before, None)
+
+    def delete_queryset(self, request, queryset):
+        # Usado pela ação "remover selecionados"
+        delete_news(queryset)
+
+    @admin.action(description="Publicar notícias selecionadas")
+    def publish_selected(self, request, queryset):
+        published = publish_news(queryset)
+        self.message_user(request, f"{len(published)} notícias publicadas.", messages.SUCCESS)
+
+    @admin.action(description="Despublicar notícias selecionadas (voltar para rascunho)")
+    def unpublish_selected(self, request, queryset):
+        unpublished = unpublish_news(queryset)
+        self.message_user(request, f"{len(unpublished)} notícias despublicadas.", messages.SUCCESS)
+
+
+@admin.register(UserPlan)
+class UserPlanAdmin(LargeTableAdmin):
+    list_display = ('user', 'plan', 'start_date', 'end_date')
+    list_select_related = ('user', 'plan')
+    list_filter = ('plan',)
+    search_fields = ('^user__username',)
+    raw_id_fields = ('user',)
+
+    def get_actions(self, request):
+        """
+        Uma ação "mover para o plano X" por plano (são poucos), cada uma um único UPDATE.
+        """
+        actions = super().get_actions(request)
+        for plan in Plan.objects.only('id', 'name').order_by('name'):
+            name = f'reassign_to_plan_{plan.pk}'
+            actions[name] = (self._reassign_action(plan), name, f"Mover selecionados para o plano \"{plan.name}\"")
+        return actions
+
+    def _reassign_action(self, plan):
+        def reassign(modeladmin, request, queryset):
+            updated = queryset.update(plan=plan)
+            modeladmin.message_user(request, f"{updated} assinaturas movidas para \"{plan.name}\".", messages.SUCCESS)
+        return reassign
+
+
+@admin.register(NewsStats)
+class NewsStatsAdmin(LargeTableAdmin):
+    list_display = ('news', 'view_count', 'unique_readers', 'updated_at')
+    list_select_related = ('news',)
+    raw_id_fields = ('news',)
+
+
+@admin.register(RelatedNews)
+class RelatedNewsAdmin(LargeTableAdmin):
+    list_display = ('news', 'rank', 'related', 'score')
+    list_select_related = ('news', 'related')
+    raw_id_fields = ('news', 'related')
+
+
+@admin.register(NewsArchiveCount)
+class NewsArchiveCountAdmin(ReadOnlyAdminMixin, LargeTableAdmin):
+    list_display = ('year', 'month', 'vertical', 'is_pro', 'count')
+    list_select_related = ('vertical',)
+    list_filter = ('is_pro', 'year')
+
+
+@admin.register(NewsTombstone)
+class NewsTombstoneAdmin(ReadOnlyAdminMixin, LargeTableAdmin):
+    list_display = ('news_id', 'reason', 'created_at')
+    list_filter = ('reason',)
+
+
+@admin.register(NewsRevision)
+class NewsRevisionAdmin(ReadOnlyAdminMixin, LargeTableAdmin):
+    list_display = ('news', 'number', 'author', 'is_snapshot', 'changed_fields', 'created_at')
+    list_select_related = ('news', 'author')
+    raw_id_fields = ('news', 'author')
+    # O conteúdo comprimido não aparece no admin; a restauração é feita pela API
+    exclude = ('data',)
+    readonly_fields = ('news', 'number', 'author', 'is_snapshot', 'changed_fields', 'created_at')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('data')
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(ReadOnlyAdminMixin, LargeTableAdmin):
+    list_display = ('id', 'task_name', 'created_at', 'dispatched_at', 'attempts')
+    search_fields = ('^task_name',)
+    readonly_fields = ('task_name', 'args', 'kwargs', 'created_at', 'dispatched_at', 'attempts', 'last_error')
@@ -0,0 +1,120 @@
+"""
+Arquivo mensal de notícias.
+
+`NewsArchiveCount` guarda, por (vertical, ano, mês, is_pro), quantas notícias
+publicadas existem. Navegação e paginação do arquivo leem essas contagens em
+vez de fazer COUNT(*) sobre `News`. Cada mudança de publicação (veja
+lifecycle.py) recalcula só os meses afetados, com uma varredura no índice
+(status, publication_date) limitada ao mês.
+"""
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import News, NewsArchiveCount
+
+
+def month_bounds(year, month):
+    """
+    Início (inclusive) e fim (exclusive) do mês no fuso do projeto.
+    """
+    start = timezone.make_aware(datetime(year, month, 1))
+    if month == 12:
+        end = timezone.make_aware(datetime(year + 1, 1, 1))
+    else:
+        end = timezone.make_aware(datetime(year, month + 1, 1))
+    return start, end
+
+
+def refresh_archive_month(year, month):
+    start, end = month_bounds(year, month)
+    published = News.objects.filter(
+        status=News.Status.PUBLISHED, publication_date__gte=start, publication_date__lt=end
+    )
+    rows = [
+        NewsArchiveCount(year=year, month=month, vertical=None, is_pro=row['is_pro'], count=row['count'])
+        for row in published.order_by().values('is_pro').annotate(count=Count('id'))
+    ]
+    rows += [
+        NewsArchiveCount(year=year, month=month, vertical_id=row['verticals'], is_pro=row['is_pro'], count=row['count'])
+        for row in published.filter(verticals__isnull=False)
+        .order_by().values('verticals', 'is_pro').annotate(count=Count('id'))
+    ]
+    with transaction.atomic():
+        NewsArchiveCount.objects.filter(year=year, month=month).delete()
+        NewsArchiveCount.objects.bulk_create(rows)
+
+
+def refresh_archive_counts(months):
+    for year, month in months:
+        refresh_archive_month(year, month)
+
+
+def rebuild_archive_counts():
+    """
+    Recalcula todos os meses que têm notícias publicadas. Retorna quantos meses foram processados.
+    """
+    bounds = News.objects.filter(status=News.Status.PUBLISHED).aggregate(
+        first=Min('publication_date'), last=Max('publication_date')
+    )
+    if bounds['first'] is None:
+        NewsArchiveCount.objects.all().delete()
+        return 0
+
+    first, last = timezone.localtime(bounds['first']), timezone.localtime(bounds['last'])
+    year, month = first.year, first.month
+    total = 0
+    while (year, month) <= (last.year, last.month):
+        refresh_archive_month(year, month)
+        total += 1
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    # Meses fora do intervalo não têm mais notícias publicadas
+    NewsArchiveCount.objects.filter(
+        Q(year__lt=first.year) | Q(year=first.year, month__lt=first.month)
+        | Q(year__gt=last.year) | Q(year=last.year, month__gt=last.month)
+    ).delete()
+    return total
+
+
+def _visible_buckets(entitlement, vertical_id=None):
+    """
+    Filtro das linhas de `NewsArchiveCount` que somam as notícias visíveis para `entitlement`.
+
+    Para leitores PRO sem vertical informada, as notícias PRO são somadas por
+    vertical liberada, então uma notícia PRO em duas verticais do plano conta
+    duas vezes: o total é um limite superior (a última página pode vir menor).
+    """
+    if vertical_id is not None:
+        buckets = Q(vertical_id=vertical_id)
+        if entitlement.sees_all or (entitlement.pro_vertical_ids and vertical_id in entitlement.pro_vertical_ids):
+            return buckets
+        return buckets & Q(is_pro=False)
+
+    if entitlement.sees_all:
+        return Q(vertical__isnull=True)
+    buckets = Q(vertical__isnull=True, is_pro=False)
+    if entitlement.pro_vertical_ids:
+        buckets |= Q(vertical_id__in=entitlement.pro_vertical_ids, is_pro=True)
+    return buckets
+
+
+def archive_month_count(entitlement, year, month, vertical_id=None):
+    """
+    Total de notícias publicadas no mês visíveis para `entitlement`.
+    """
+    return NewsArchiveCount.objects.filter(
+        _visible_buckets(entitlement, vertical_id), year=year, month=month
+    ).aggregate(total=Sum('count'))['total'] or 0
+
+
+def archive_months(entitlement, vertical_id=None):
+    """
+    [{year, month, count}] dos meses com notícias visíveis, do mais recente ao mais antigo.
+    """
+    return [
+        row for row in NewsArchiveCount.objects.filter(_visible_buckets(entitlement, vertical_id))
+        .values('year', 'month').annotate(count=Sum('count')).order_by('-year', '-month')
+        if row['count']
+    ]
@@ -0,0 +1,208 @@
+"""
+Contadores de leitura das notícias.
+
+Cada leitura (NewsViewSet.retrieve) só toca o Redis:
+- HINCRBY em um hash de deltas pendentes (views);
+- PFADD em um HyperLogLog por notícia (leitores únicos);
+- ZINCRBY no bucket da hora corrente (base dos rankings por janela).
+
+Periodicamente, `flush_news_counters` grava os deltas acumulados em
+`NewsStats` em lote (cada lote tem um id gravado junto com as linhas, então
+repetir um flush interrompido não soma as leituras duas vezes), e `refresh_most_read` pré-calcula os rankings "mais lidas"
+de cada janela (global e por vertical), servidos direto do Redis.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+import redis
+from django.db import transaction
+from django.utils import timezone
+
+from .models import News, NewsStats
+from .redis_client import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+PENDING_VIEWS_KEY = 'news:views:pending'
+DIRTY_READERS_KEY = 'news:readers:dirty'
+READERS_KEY = 'news:readers:{news_id}'
+HOURLY_VIEWS_KEY = 'news:views:hour:{hour}'
+MOST_READ_KEY = 'news:most_read:{window}'
+MOST_READ_VERTICAL_KEY = 'news:most_read:{window}:vertical:{vertical_id}'
+
+# Janelas disponíveis no endpoint "mais lidas" (em horas)
+MOST_READ_WINDOWS = {'1h': 1, '6h': 6, '24h': 24}
+DEFAULT_MOST_READ_WINDOW = '24h'
+# Quantas notícias cada ranking pré-calculado guarda
+MOST_READ_SIZE = 200
+# Rankings não atualizados expiram (ex.: vertical que saiu do top)
+MOST_READ_TTL = 60 * 60
+HOURLY_BUCKET_TTL = (max(MOST_READ_WINDOWS.values()) + 2) * 60 * 60
+
+
+def _hour_bucket(moment):
+    return moment.strftime('%Y%m%d%H')
+
+
+def reader_key_for(request):
+    """
+    Identifica o leitor para a contagem de únicos: usuário autenticado ou IP.
+    """
+    if request.user and request.user.is_authenticated:
+        return f"u:{request.user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def record_news_view(news_id, reader_key):
+    """
+    Registra uma leitura da notícia. Nunca derruba a requisição se o Redis falhar.
+    """
+    hour_key = HOURLY_VIEWS_KEY.format(hour=_hour_bucket(timezone.now()))
+    try:
+        pipe = get_redis_connection().pipeline(transaction=False)
+        pipe.hincrby(PENDING_VIEWS_KEY, news_id, 1)
+        pipe.pfadd(READERS_KEY.format(news_id=news_id), reader_key)
+        pipe.sadd(DIRTY_READERS_KEY, news_id)
+        pipe.zincrby(hour_key, 1, news_id)
+        pipe.expire(hour_key, HOURLY_BUCKET_TTL)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("Falha ao registrar leitura da notícia %s no Redis.", news_id, exc_info=True)
+
+
+def _claim(conn, key):
+    """
+    Move `key` para uma chave de processamento (RENAME é atômico), de modo que
+    novos incrementos caiam em uma chave nova enquanto o lote é gravado. Se um
+    flush anterior falhou no meio, a chave de processamento antiga é retomada.
+    """
+    processing_key = f"{key}:flushing"
+    if not conn.exists(processing_key):
+        try:
+            conn.rename(key, processing_key)
+        except redis.ResponseError: # Nada pendente
+            pass
+    return processing_key
+
+
+def flush_news_counters(batch_size=500):
+    """
+    Grava em `NewsStats` os deltas acumulados no Redis. Retorna quantas notícias foram atualizadas.
+
+    Deve rodar em um único worker por vez (fila de manutenção, concorrência 1).
+    """
+    conn = get_redis_connection()
+    views_key = _claim(conn, PENDING_VIEWS_KEY)
+    readers_key = _claim(conn, DIRTY_READERS_KEY)
+    # Id do lote em processamento; um flush que retoma o lote reutiliza o mesmo id
+    batch_key = f"{views_key}:batch"
+    conn.set(batch_key, uuid.uuid4().hex, nx=True)
+    batch_id = conn.get(batch_key)
+
+    deltas = {int(news_id): int(delta) for news_id, delta in conn.hgetall(views_key).items()}
+    dirty_readers = {int(news_id) for news_id in conn.smembers(readers_key)}
+    news_ids = set(News.objects.filter(id__in=set(deltas) | dirty_readers).values_list('id', flat=True))
+
+    unique_counts = {}
+    if news_ids:
+        pipe = conn.pipeline(transaction=False)
+        ordered_ids = sorted(news_ids)
+        for news_id in ordered_ids:
+            pipe.pfcount(READERS_KEY.format(news_id=news_id))
+        unique_counts = dict(zip(ordered_ids, pipe.execute()))
+
+    now = timezone.now()
+    with transaction.atomic():
+        existing = NewsStats.objects.select_for_update().in_bulk(news_ids)
+        to_update, to_create = [], []
+        for news_id in news_ids:
+            stats = existing.get(news_id)
+            if stats is None:
+                stats = NewsStats(news_id=news_id)
+                to_create.append(stats)
+            else:
+                to_update.append(stats)
+            # Linha já gravada com este lote (flush anterior commitou e falhou antes do DELETE)
+            if stats.flush_id != batch_id:
+                stats.view_count += deltas.get(news_id, 0)
+                stats.flush_id = batch_id
+            stats.unique_readers = unique_counts.get(news_id, stats.unique_readers)
+            stats.updated_at = now
+
+        NewsStats.objects.bulk_create(to_create, batch_size=batch_size)
+        NewsStats.objects.bulk_update(
+            to_update, ['view_count', 'unique_readers', 'flush_id', 'updated_at'], batch_size=batch_size
+        )
+    # Só depois do commit: se falhar, o próximo flush retoma o lote com o mesmo id
+    conn.delete(views_key, readers_key, batch_key)
+    return len(news_ids)
+
+
+def _replace_zset(pipe, key, scores):
+    """
+    Substitui o conteúdo de um sorted set de forma atômica (escreve em uma chave
+    temporária e faz RENAME), para que leitores nunca vejam um ranking pela metade.
+    """
+    tmp_key = f"{key}:tmp"
+    pipe.delete(tmp_key)
+    if scores:
+        pipe.zadd(tmp_key, scores)
+        pipe.rename(tmp_key, key)
+        pipe.expire(key, MOST_READ_TTL)
+    else:
+        pipe.delete(key)
+
+
+def refresh_most_read():
+    """
+    Pré-calcula os rankings "mais lidas" de cada janela, global e por vertical.
+    """
+    conn = get_redis_connection()
+    now = timezone.now()
+
+    for window, hours in MOST_READ_WINDOWS.items():
+        buckets = [
+            HOURLY_VIEWS_KEY.format(hour=_hour_bucket(now - timedelta(hours=offset)))
+            for offset in range(hours)
+        ]
+        window_key = MOST_READ_KEY.format(window=window)
+        tmp_key = f"{window_key}:tmp"
+        pipe = conn.pipeline()
+        pipe.zunionstore(tmp_key, buckets)
+        # Mantém apenas o topo: o suficiente para filtrar por vertical/plano depois
+        pipe.zremrangebyrank(tmp_key, 0, -(MOST_READ_SIZE * 5) - 1)
+        pipe.zrevrange(tmp_key, 0, -1, withscores=True)
+        pipe.delete(tmp_key)
+        top = pipe.execute()[2]
+
+        scores = {int(news_id): score for news_id, score in top}
+        by_vertical = {}
+        for news_id, vertical_id in News.verticals.through.objects.filter(
+            news_id__in=scores
+        ).values_list('news_id', 'vertical_id'):
+            by_vertical.setdefault(vertical_id, {})[news_id] = scores[news_id]
+
+        pipe = conn.pipeline()
+        global_top = dict(sorted(scores.items(), key=lambda item: -item[1])[:MOST_READ_SIZE])
+        _replace_zset(pipe, window_key, global_top)
+        for vertical_id, vertical_scores in by_vertical.items():
+            vertical_top = dict(sorted(vertical_scores.items(), key=lambda item: -item[1])[:MOST_READ_SIZE])
+            _replace_zset(pipe, MOST_READ_VERTICAL_KEY.format(window=window, vertical_id=vertical_id), vertical_top)
+        pipe.execute()
+
+
+def get_most_read(window, vertical_id=None, limit=MOST_READ_SIZE):
+    """
+    Retorna [(news_id, views)] do ranking pré-calculado, do mais lido para o menos lido.
+    """
+    if vertical_id is None:
+        key = MOST_READ_KEY.format(window=window)
+    else:
+        key = MOST_READ_VERTICAL_KEY.format(window=window, vertical_id=vertical_id)
+    try:
+        ranking = get_redis_connection().zrevrange(key, 0, limit - 1, withscores=True)
+    except redis.RedisError:
+        logger.warning("Falha ao ler o ranking %s do Redis.", key, exc_info=True)
+        return []
+    return [(int(news_id), int(score)) for news_id, score in ranking]
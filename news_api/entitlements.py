@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from typing import FrozenSet, Optional
+
+from django.db.models import Q
+
+from .models import News, User, UserPlan
+
+
+@dataclass(frozen=True)
+class Entitlement:
+    """
+    O que um usuário pode ler:
+    - `sees_all`: Admins/Editores veem tudo (inclusive rascunhos);
+    - `pro_vertical_ids`: verticais PRO liberadas pelo plano (None = sem acesso PRO).
+    Os demais veem apenas notícias publicadas não-PRO.
+    """
+    sees_all: bool = False
+    pro_vertical_ids: Optional[FrozenSet[int]] = None
+
+    @property
+    def key(self):
+        """
+        Identificador estável da classe de acesso (usuários com o mesmo acesso compartilham a chave).
+        """
+        if self.sees_all:
+            return 'editor'
+        if self.pro_vertical_ids is None:
+            return 'open'
+        return 'pro:' + ','.join(str(vertical_id) for vertical_id in sorted(self.pro_vertical_ids))
+
+    def filter_news(self, queryset):
+        if self.sees_all:
+            return queryset
+        queryset = queryset.filter(status=News.Status.PUBLISHED)
+        if self.pro_vertical_ids is None:
+            return queryset.filter(is_pro=False)
+        # distinct() evita duplicatas se a notícia pertence a múltiplas verticais permitidas
+        return queryset.filter(Q(is_pro=False) | Q(verticals__id__in=self.pro_vertical_ids)).distinct()
+
+    def can_see(self, status, is_pro, vertical_ids):
+        if self.sees_all:
+            return True
+        if status != News.Status.PUBLISHED:
+            return False
+        if not is_pro:
+            return True
+        return self.pro_vertical_ids is not None and bool(self.pro_vertical_ids & set(vertical_ids))
+
+
+def entitlement_for(user):
+    if user is None or not user.is_authenticated:
+        return Entitlement()
+    if user.role in (User.Role.ADMIN, User.Role.EDITOR):
+        return Entitlement(sees_all=True)
+    if user.role == User.Role.READER:
+        try:
+            plan = user.plan_subscription.plan
+        except UserPlan.DoesNotExist: # Leitor sem plano associado
+            return Entitlement()
+        if plan.is_pro_plan:
+            return Entitlement(pro_vertical_ids=frozenset(plan.allowed_verticals.values_list('id', flat=True)))
+    return Entitlement()
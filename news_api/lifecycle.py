@@ -0,0 +1,232 @@
+"""
+Ciclo de vida das notícias: ponto único por onde passam as mudanças que
+afetam dados derivados (contagens do arquivo e das listagens, tombstones da
+sincronização, eventos do stream SSE, etc.).
+
+Quem altera uma notícia descreve o estado antes/depois com `news_state` e
+chama `record_news_change`; as atualizações derivadas são gravadas na outbox,
+na mesma transação, e processadas pelos workers após o commit.
+"""
+import hashlib
+import uuid
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import News, NewsTombstone
+from .outbox import enqueue_tasks
+
+# Campos que, ao mudar, afetam o arquivo mensal
+ARCHIVE_FIELDS = ('status', 'is_pro', 'publication_date', 'verticals')
+
+
+def news_state(news, vertical_ids=None):
+    """
+    Estado (serializável em JSON) de uma notícia, usado para comparar antes/depois.
+    """
+    if vertical_ids is None:
+        vertical_ids = news.verticals.values_list('id', flat=True)
+    return {
+        'title': news.title,
+        'status': news.status,
+        'is_pro': news.is_pro,
+        'publication_date': news.publication_date.isoformat() if news.publication_date else None,
+        'verticals': sorted(vertical_ids),
+    }
+
+
+def _archive_month(state):
+    if not state or state['status'] != News.Status.PUBLISHED or not state['publication_date']:
+        return None
+    published = timezone.localtime(parse_datetime(state['publication_date']))
+    return [published.year, published.month]
+
+
+def _tombstone_reason(before, after):
+    """
+    Motivo pelo qual a notícia pode ter deixado de ser visível para alguém, ou None.
+    """
+    if before is None:
+        return None
+    if after is None:
+        return NewsTombstone.Reason.DELETED
+    if before['status'] == News.Status.PUBLISHED and after['status'] != News.Status.PUBLISHED:
+        return NewsTombstone.Reason.UNPUBLISHED
+    if after['is_pro'] and (not before['is_pro'] or before['verticals'] != after['verticals']):
+        return NewsTombstone.Reason.RESTRICTED
+    return None
+
+
+def _became_published(before, after):
+    return (
+        after is not None and after['status'] == News.Status.PUBLISHED
+        and (before is None or before['status'] != News.Status.PUBLISHED)
+    )
+
+
+def _changed(before, after, fields):
+    if before is None or after is None:
+        return True
+    return any(before.get(field) != after.get(field) for field in fields)
+
+
+def record_news_changes(changes):
+    """
+    Registra mudanças de notícias. `changes` é uma lista de (news_id, antes, depois);
+    `antes` é None para notícias novas e `depois` é None para notícias removidas.
+    """
+    from .news_counts import count_deltas
+    from .streams import published_event
+    from .tasks import (
+        apply_news_count_deltas_task, refresh_archive_counts_task, send_notification_news_published_task
+    )
+
+    tombstones = []
+    months = []
+    published = []
+    published_keys = []
+    for news_id, before, after in changes:
+        if _became_published(before, after):
+            published.append(published_event(news_id, after))
+            published_keys.append(f"{news_id}@{after['publication_date']}")
+        reason = _tombstone_reason(before, after)
+        if reason:
+            tombstones.append(NewsTombstone(news_id=news_id, reason=reason))
+        if _changed(before, after, ARCHIVE_FIELDS):
+            for month in (_archive_month(before), _archive_month(after)):
+                if month and month not in months:
+                    months.append(month)
+
+    if tombstones:
+        NewsTombstone.objects.bulk_create(tombstones)
+
+    messages = []
+    if months:
+        messages.append((refresh_archive_counts_task.name, [months], {}))
+    if published:
+        # Se o relay publicar a mensagem duas vezes, o evento não é duplicado no stream
+        dedupe_key = hashlib.sha1(','.join(published_keys).encode()).hexdigest()
+        messages.append((send_notification_news_published_task.name, [published], {'dedupe_key': dedupe_key}))
+    deltas = count_deltas(changes)
+    if deltas:
+        # Incremento não é idempotente: a chave única evita aplicá-lo duas vezes se o relay repetir
+        messages.append((apply_news_count_deltas_task.name, [deltas], {'dedupe_key': uuid.uuid4().hex}))
+    if messages:
+        enqueue_tasks(messages)
+
+
+def record_news_change(news_id, before, after):
+    record_news_changes([(news_id, before, after)])
+
+
+def _locked_states(queryset, skip_locked=False):
+    """
+    Trava as notícias do queryset (SELECT ... FOR UPDATE) e retorna {id: estado}
+    no formato de `news_state`, com duas consultas no total.
+    """
+    rows = list(
+        News.objects.select_for_update(skip_locked=skip_locked)
+        .filter(id__in=queryset.order_by().values('id'))
+        .values_list('id', 'title', 'status', 'is_pro', 'publication_date', 'scheduled_publish_date')
+    )
+    vertical_ids = {row[0]: [] for row in rows}
+    for news_id, vertical_id in News.verticals.through.objects.filter(
+        news_id__in=vertical_ids
+    ).values_list('news_id', 'vertical_id'):
+        vertical_ids[news_id].append(vertical_id)
+
+    states = {}
+    for news_id, title, status, is_pro, publication_date, scheduled_date in rows:
+        states[news_id] = {
+            'title': title, 'status': status, 'is_pro': is_pro,
+            'publication_date': publication_date.isoformat() if publication_date else None,
+            'verticals': sorted(vertical_ids[news_id]),
+            # Usado só para calcular o estado "depois"; removido antes de registrar
+            'scheduled_publish_date': scheduled_date,
+        }
+    return states
+
+
+def _bulk_transition(queryset, updates, state_changes, skip_locked=False):
+    """
+    Aplica `updates` às notícias do queryset com um único UPDATE e registra as
+    mudanças. `state_changes(scheduled_publish_date)` devolve o que muda no
+    estado de cada notícia (ex.: a nova publication_date). Retorna os ids alterados.
+    """
+    with transaction.atomic():
+        states = _locked_states(queryset, skip_locked=skip_locked)
+        if not states:
+            return []
+
+        News.objects.filter(id__in=states).update(**updates, updated_at=timezone.now()) # update() não aciona o auto_now
+
+        changes = []
+        for news_id, before in states.items():
+            scheduled_date = before.pop('scheduled_publish_date')
+            changes.append((news_id, before, dict(before, **state_changes(scheduled_date))))
+        record_news_changes(changes)
+    return list(states)
+
+
+def delete_news(queryset):
+    """
+    Remove as notícias do queryset e registra as remoções. Retorna os ids removidos.
+    """
+    with transaction.atomic():
+        states = _locked_states(queryset)
+        if not states:
+            return []
+        News.objects.filter(id__in=states).delete()
+        changes = []
+        for news_id, before in states.items():
+            before.pop('scheduled_publish_date')
+            changes.append((news_id, before, None))
+        record_news_changes(changes)
+    return list(states)
+
+
+def promote_due_scheduled_news():
+    """
+    Publica as notícias agendadas cuja data já passou. Retorna os ids promovidos.
+    """
+    due = News.objects.filter(status=News.Status.SCHEDULED, scheduled_publish_date__lte=timezone.now())
+    # Checagem barata antes de abrir transação/travar linhas: roda em todo GET de /api/news/
+    if not due.exists():
+        return []
+    return _bulk_transition(
+        due,
+        {
+            'status': News.Status.PUBLISHED,
+            'publication_date': F('scheduled_publish_date'),
+            'scheduled_publish_date': None,
+        },
+        lambda scheduled_date: {
+            'status': News.Status.PUBLISHED, 'publication_date': scheduled_date.isoformat(),
+        },
+        skip_locked=True,
+    )
+
+
+def publish_news(queryset):
+    """
+    Publica agora as notícias (ainda não publicadas) do queryset. Retorna os ids publicados.
+    """
+    now = timezone.now()
+    return _bulk_transition(
+        queryset.exclude(status=News.Status.PUBLISHED),
+        {'status': News.Status.PUBLISHED, 'publication_date': now, 'scheduled_publish_date': None},
+        lambda scheduled_date: {'status': News.Status.PUBLISHED, 'publication_date': now.isoformat()},
+    )
+
+
+def unpublish_news(queryset):
+    """
+    Volta para rascunho as notícias publicadas do queryset. Retorna os ids alterados.
+    """
+    return _bulk_transition(
+        queryset.filter(status=News.Status.PUBLISHED),
+        {'status': News.Status.DRAFT},
+        lambda scheduled_date: {'status': News.Status.DRAFT},
+    )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from news_api.schema import build_schema, schema_version
+
+
+class Command(BaseCommand):
+    help = "Gera o schema OpenAPI da versão atual do código (arquivos em disco + cache)."
+
+    def handle(self, *args, **options):
+        paths = build_schema()
+        self.stdout.write(self.style.SUCCESS(
+            f"Schema da versão {schema_version()} gerado: {', '.join(str(path) for path in paths)}"
+        ))
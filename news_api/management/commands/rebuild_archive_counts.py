@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from news_api.archive import rebuild_archive_counts
+
+
+class Command(BaseCommand):
+    help = "Recalcula as contagens mensais do arquivo de notícias."
+
+    def handle(self, *args, **options):
+        total = rebuild_archive_counts()
+        self.stdout.write(self.style.SUCCESS(f"Contagens recalculadas para {total} meses."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from news_api.news_counts import reconcile_news_counts
+
+
+class Command(BaseCommand):
+    help = "Recalcula as contagens das listagens de notícias por classe de acesso."
+
+    def handle(self, *args, **options):
+        counts = reconcile_news_counts()
+        self.stdout.write(self.style.SUCCESS(f"Contagens recalculadas ({len(counts)} buckets)."))
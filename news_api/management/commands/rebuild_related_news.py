@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from news_api.related import rebuild_related_news
+
+
+class Command(BaseCommand):
+    help = "Recalcula as notícias relacionadas de todo o corpus publicado."
+
+    def handle(self, *args, **options):
+        total = rebuild_related_news()
+        self.stdout.write(self.style.SUCCESS(f"Relacionadas recalculadas para {total} notícias."))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from news_api.outbox import purge_dispatched, relay_outbox
+
+
+class Command(BaseCommand):
+    help = "Publica no Celery as tasks pendentes da outbox transacional."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Mensagens publicadas por lote.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Espera (s) quando a outbox está vazia.")
+        parser.add_argument('--once', action='store_true', help="Drena a outbox uma vez e sai.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.stdout.write(f"Relay da outbox iniciado (lotes de {batch_size}).")
+        last_purge = 0.0
+
+        while True:
+            # Drena enquanto houver lotes cheios; só dorme quando a fila esvaziar
+            sent = relay_outbox(batch_size=batch_size)
+            while sent == batch_size:
+                sent = relay_outbox(batch_size=batch_size)
+
+            if options['once']:
+                return
+
+            if time.monotonic() - last_purge > 3600:
+                purged = purge_dispatched()
+                if purged:
+                    self.stdout.write(f"{purged} mensagens antigas removidas da outbox.")
+                last_purge = time.monotonic()
+
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.20 on 2026-10-19 16:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_api', '0002_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsStats',
+            fields=[
+                ('news', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='news_api.news')),
+                ('view_count', models.PositiveBigIntegerField(default=0)),
+                ('unique_readers', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'News Stats',
+                'verbose_name_plural': 'News Stats',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.20 on 2026-10-19 16:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_api', '0003_newsstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedNews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('news', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='news_api.news')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='news_api.news')),
+            ],
+            options={
+                'verbose_name': 'Related News',
+                'verbose_name_plural': 'Related News',
+                'ordering': ['news', 'rank'],
+                'indexes': [models.Index(fields=['news', 'rank'], name='related_news_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='relatednews',
+            constraint=models.UniqueConstraint(fields=('news', 'related'), name='unique_related_news'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.20 on 2026-10-19 16:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_api', '0004_relatednews'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsArchiveCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('is_pro', models.BooleanField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'News Archive Count',
+                'verbose_name_plural': 'News Archive Counts',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['status', 'publication_date'], name='news_status_pubdate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['status', 'scheduled_publish_date'], name='news_status_scheduled_idx'),
+        ),
+        migrations.AddField(
+            model_name='newsarchivecount',
+            name='vertical',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='news_api.vertical'),
+        ),
+        migrations.AddConstraint(
+            model_name='newsarchivecount',
+            constraint=models.UniqueConstraint(fields=('year', 'month', 'vertical', 'is_pro'), name='unique_archive_bucket'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.20 on 2026-10-19 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_api', '0005_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('news_id', models.BigIntegerField(db_index=True)),
+                ('reason', models.CharField(choices=[('DELETED', 'Deleted'), ('UNPUBLISHED', 'Unpublished'), ('RESTRICTED', 'Restricted')], max_length=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'News Tombstone',
+                'verbose_name_plural': 'News Tombstones',
+            },
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='plan',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='vertical',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
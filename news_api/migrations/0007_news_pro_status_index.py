@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-19 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_api', '0006_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['is_pro', 'status', 'publication_date'], name='news_pro_status_pubdate_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.20 on 2026-10-19 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_api', '0007_news_pro_status_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'is_active'], name='user_role_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userplan',
+            index=models.Index(fields=['end_date'], name='userplan_end_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userplan',
+            index=models.Index(fields=['plan', 'end_date'], name='userplan_plan_end_date_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.20 on 2026-10-19 16:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_api', '0008_user_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('is_snapshot', models.BooleanField(default=False)),
+                ('changed_fields', models.JSONField(default=list)),
+                ('data', models.BinaryField()),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('news', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='news_api.news')),
+            ],
+            options={
+                'verbose_name': 'News Revision',
+                'verbose_name_plural': 'News Revisions',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='newsrevision',
+            constraint=models.UniqueConstraint(fields=('news', 'number'), name='news_revision_number_unique'),
+        ),
+    ]
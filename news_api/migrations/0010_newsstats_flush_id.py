@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-19 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news_api', '0009_newsrevision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsstats',
+            name='flush_id',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
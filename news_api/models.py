@@ -20,9 +20,16 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Filtros do diretório de usuários (a PK entra no fim do índice: paginação por id)
+            models.Index(fields=['role', 'is_active'], name='user_role_active_idx'),
+        ]
+
 class Vertical(models.Model):
     name = models.CharField(max_length=100, unique=True) # Ex: Poder, Tributos, Saúde, etc.
     slug = models.SlugField(max_length=110, unique=True, blank=True) # Gerado a partir do nome
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -61,6 +68,7 @@ class News(models.Model):
     status = models.CharField(max_length=10, choices=Status.choices, default=Status.DRAFT)
     verticals = models.ManyToManyField(Vertical, related_name='news')
     is_pro = models.BooleanField(default=False) # True se for notícia PRO
+    updated_at = models.DateTimeField(auto_now=True, db_index=True) # Base da sincronização incremental
 
     def __str__(self):
         return self.title
@@ -69,12 +77,130 @@ class News(models.Model):
         verbose_name = "News"
         verbose_name_plural = "News"
         ordering = ['-publication_date'] # Ordenar por data de publicação descendente
+        indexes = [
+            # Listagens e arquivo mensal: status fixo + faixa de publication_date
+            models.Index(fields=['status', 'publication_date'], name='news_status_pubdate_idx'),
+            # Listagem aberta (is_pro=False, PUBLISHED) e filtros PRO/status do admin
+            models.Index(fields=['is_pro', 'status', 'publication_date'], name='news_pro_status_pubdate_idx'),
+            # Promoção das agendadas: status=SCHEDULED + scheduled_publish_date <= agora
+            models.Index(fields=['status', 'scheduled_publish_date'], name='news_status_scheduled_idx'),
+        ]
+
+
+# Contadores de leitura agregados. Os incrementos acontecem no Redis e são
+# gravados aqui em lote periodicamente (veja counters.py).
+class NewsStats(models.Model):
+    news = models.OneToOneField(News, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    view_count = models.PositiveBigIntegerField(default=0)
+    unique_readers = models.PositiveBigIntegerField(default=0) # Aproximado (HyperLogLog)
+    updated_at = models.DateTimeField(default=timezone.now)
+    # Último lote do flush aplicado a esta linha: um flush repetido não soma o mesmo lote duas vezes
+    flush_id = models.CharField(max_length=32, blank=True, default='')
+
+    def __str__(self):
+        return f"{self.news_id}: {self.view_count} views"
+
+    class Meta:
+        verbose_name = "News Stats"
+        verbose_name_plural = "News Stats"
+
+
+# Notícias relacionadas pré-calculadas (top-k por similaridade, veja related.py)
+class RelatedNews(models.Model):
+    news = models.ForeignKey(News, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(News, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField() # 0 = mais parecida
+
+    def __str__(self):
+        return f"{self.news_id} -> {self.related_id} ({self.score:.3f})"
+
+    class Meta:
+        verbose_name = "Related News"
+        verbose_name_plural = "Related News"
+        ordering = ['news', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['news', 'related'], name='unique_related_news'),
+        ]
+        indexes = [
+            models.Index(fields=['news', 'rank'], name='related_news_rank_idx'),
+        ]
+
+
+class NewsTombstone(models.Model):
+    """
+    Registro de que uma notícia pode ter deixado de ser visível (removida,
+    despublicada ou restrita a PRO). Usado pelo endpoint de sincronização
+    incremental para avisar os clientes do que sumiu.
+    """
+    class Reason(models.TextChoices):
+        DELETED = 'DELETED', _('Deleted')
+        UNPUBLISHED = 'UNPUBLISHED', _('Unpublished')
+        RESTRICTED = 'RESTRICTED', _('Restricted')
+
+    news_id = models.BigIntegerField(db_index=True) # Sem FK: a notícia pode não existir mais
+    reason = models.CharField(max_length=12, choices=Reason.choices)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.news_id} {self.reason}"
+
+    class Meta:
+        verbose_name = "News Tombstone"
+        verbose_name_plural = "News Tombstones"
+
+
+class NewsRevision(models.Model):
+    """
+    Revisão de uma notícia (veja revisions.py). `data` guarda, comprimido, o
+    documento completo (snapshot) ou só o diff para a revisão anterior.
+    """
+    news = models.ForeignKey(News, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField() # Sequencial por notícia, começando em 1
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    is_snapshot = models.BooleanField(default=False)
+    changed_fields = models.JSONField(default=list)
+    data = models.BinaryField()
+
+    def __str__(self):
+        return f"{self.news_id} #{self.number}"
+
+    class Meta:
+        verbose_name = "News Revision"
+        verbose_name_plural = "News Revisions"
+        constraints = [
+            models.UniqueConstraint(fields=['news', 'number'], name='news_revision_number_unique'),
+        ]
+
+
+# Contagem de notícias publicadas por mês, vertical e PRO/não-PRO (veja archive.py).
+# vertical nulo = total do mês considerando todas as verticais.
+class NewsArchiveCount(models.Model):
+    vertical = models.ForeignKey(Vertical, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    is_pro = models.BooleanField()
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d} {self.vertical_id or 'todas'} pro={self.is_pro}: {self.count}"
+
+    class Meta:
+        verbose_name = "News Archive Count"
+        verbose_name_plural = "News Archive Counts"
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month', 'vertical', 'is_pro'], name='unique_archive_bucket'),
+        ]
 
 
 class Plan(models.Model):
     name = models.CharField(max_length=100, unique=True) # Ex: JOTA Info, JOTA PRO - Tributos, JOTA PRO - Full
     is_pro_plan = models.BooleanField(default=False)
     allowed_verticals = models.ManyToManyField(Vertical, blank=True) # Verticais permitidas para planos PRO
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -101,4 +227,32 @@ class UserPlan(models.Model):
 
     class Meta:
         verbose_name = "User Plan"
-        verbose_name_plural = "User Plans"
\ No newline at end of file
+        verbose_name_plural = "User Plans"
+        indexes = [
+            # Filtro por vencimento da assinatura, com ou sem plano
+            models.Index(fields=['end_date'], name='userplan_end_date_idx'),
+            models.Index(fields=['plan', 'end_date'], name='userplan_plan_end_date_idx'),
+        ]
+
+
+# Outbox transacional: tasks Celery gravadas na mesma transação da alteração
+# que as originou e publicadas no broker por um processo separado (relay).
+class OutboxMessage(models.Model):
+    task_name = models.CharField(max_length=200) # Nome registrado da task Celery
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(blank=True, null=True) # Preenchido pelo relay após publicar
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return f"{self.task_name} #{self.pk}"
+
+    class Meta:
+        verbose_name = "Outbox Message"
+        verbose_name_plural = "Outbox Messages"
+        indexes = [
+            # O relay busca as pendentes (dispatched_at nulo) em ordem de id
+            models.Index(fields=['dispatched_at', 'id'], name='outbox_pending_idx'),
+        ]
@@ -0,0 +1,130 @@
+"""
+Totais das listagens de notícias por classe de acesso (veja entitlements.py).
+
+Em vez de COUNT(*) (para leitores PRO, COUNT(DISTINCT ...) sobre o join de
+verticais) a cada página, um hash no Redis guarda contagens por "bucket":
+- `all`: todas as notícias (o que Admins/Editores veem);
+- `open`: publicadas não-PRO;
+- `pro:<ids>`: publicadas PRO cujo conjunto exato de verticais é `<ids>`.
+
+O total de uma classe é derivado dos buckets: `all` para editores, `open`
+para os demais, mais os buckets PRO que têm alguma vertical do plano. Como
+cada notícia PRO está em exatamente um bucket, o total é exato mesmo quando
+ela pertence a várias verticais do plano.
+
+Os buckets são atualizados incrementalmente pelos eventos do ciclo de vida
+(lifecycle.py, via outbox) e recalculados periodicamente por
+`reconcile_news_counts`, que corrige desvios (ex.: edições feitas fora da
+API). Sem as contagens (Redis vazio ou fora do ar) a paginação cai na
+estimativa de `pagination.approximate_count`.
+"""
+import logging
+from collections import Counter
+
+import redis
+
+from .models import News
+from .redis_client import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+NEWS_COUNTS_KEY = 'news:counts'
+
+
+def _pro_bucket(vertical_ids):
+    return 'pro:' + ','.join(str(vertical_id) for vertical_id in sorted(vertical_ids))
+
+
+def count_buckets(state):
+    """
+    Buckets em que uma notícia no estado `state` (de lifecycle.news_state) é contada.
+    """
+    if state is None:
+        return []
+    buckets = ['all']
+    if state['status'] == News.Status.PUBLISHED:
+        buckets.append(_pro_bucket(state['verticals']) if state['is_pro'] else 'open')
+    return buckets
+
+
+def count_deltas(changes):
+    """
+    {bucket: delta} das mudanças [(news_id, antes, depois)], sem os deltas nulos.
+    """
+    deltas = Counter()
+    for _, before, after in changes:
+        deltas.subtract(count_buckets(before))
+        deltas.update(count_buckets(after))
+    return {bucket: delta for bucket, delta in deltas.items() if delta}
+
+
+def apply_count_deltas(deltas):
+    """
+    Aplica os deltas. Antes da primeira reconciliação o hash não existe e os deltas
+    são descartados: aplicados sobre um hash vazio, gerariam totais parciais.
+    """
+    def increment(pipe):
+        if not pipe.exists(NEWS_COUNTS_KEY):
+            return
+        pipe.multi()
+        for bucket, delta in deltas.items():
+            pipe.hincrby(NEWS_COUNTS_KEY, bucket, delta)
+
+    get_redis_connection().transaction(increment, NEWS_COUNTS_KEY)
+
+
+def reconcile_news_counts():
+    """
+    Recalcula todos os buckets a partir do banco e substitui o hash de uma vez. Retorna os buckets.
+
+    Deltas aplicados durante o cálculo podem ser sobrescritos; o desvio some na próxima execução.
+    """
+    published = News.objects.filter(status=News.Status.PUBLISHED)
+    counts = Counter({
+        'all': News.objects.count(),
+        'open': published.filter(is_pro=False).count(),
+    })
+
+    vertical_sets = {}
+    for news_id, vertical_id in News.verticals.through.objects.filter(
+        news__status=News.Status.PUBLISHED, news__is_pro=True
+    ).order_by().values_list('news_id', 'vertical_id').iterator():
+        vertical_sets.setdefault(news_id, []).append(vertical_id)
+    counts.update(_pro_bucket(vertical_ids) for vertical_ids in vertical_sets.values())
+    without_verticals = published.filter(is_pro=True).count() - len(vertical_sets)
+    if without_verticals:
+        counts[_pro_bucket([])] += without_verticals
+
+    staging_key = f'{NEWS_COUNTS_KEY}:staging'
+    pipe = get_redis_connection().pipeline()
+    pipe.delete(staging_key)
+    pipe.hset(staging_key, mapping=dict(counts))
+    pipe.rename(staging_key, NEWS_COUNTS_KEY)
+    pipe.execute()
+    return dict(counts)
+
+
+def visible_news_count(entitlement):
+    """
+    Total de notícias da listagem padrão visíveis para `entitlement`, ou None se as
+    contagens não estão disponíveis.
+    """
+    try:
+        counts = get_redis_connection().hgetall(NEWS_COUNTS_KEY)
+    except redis.RedisError:
+        logger.warning("Contagens de notícias indisponíveis no Redis.", exc_info=True)
+        return None
+    if not counts:
+        return None
+
+    if entitlement.sees_all:
+        return max(int(counts.get('all', 0)), 0)
+    total = int(counts.get('open', 0))
+    if entitlement.pro_vertical_ids:
+        for bucket, count in counts.items():
+            if not bucket.startswith('pro:') or bucket == 'pro:':
+                continue
+            vertical_ids = {int(vertical_id) for vertical_id in bucket[4:].split(',')}
+            if vertical_ids & entitlement.pro_vertical_ids:
+                total += int(count)
+    return max(total, 0)
@@ -0,0 +1,89 @@
+"""
+Outbox transacional para publicar tasks Celery somente após o commit.
+
+O caminho da requisição nunca fala com o broker: `enqueue_task` apenas grava
+uma linha em `OutboxMessage` dentro da transação corrente. O relay
+(`python manage.py relay_outbox`) lê as mensagens já commitadas em lotes e as
+publica no Celery. Se a transação sofrer rollback, a mensagem some junto; se o
+broker estiver fora, a mensagem continua pendente e é publicada depois.
+
+A entrega é at-least-once: se o relay cair entre publicar e marcar a mensagem,
+ela é publicada de novo. Tasks que não podem rodar duas vezes devem usar uma
+`dedupe_key` (veja `DedupeTask` em tasks.py).
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+
+def enqueue_task(task_name, args=None, kwargs=None):
+    """
+    Agenda a task `task_name` para ser publicada após o commit da transação atual.
+    """
+    return OutboxMessage.objects.create(
+        task_name=task_name, args=list(args or []), kwargs=dict(kwargs or {})
+    )
+
+
+def enqueue_tasks(messages):
+    """
+    Versão em lote de `enqueue_task`: `messages` é uma lista de
+    (task_name, args, kwargs). Usa um único INSERT.
+    """
+    return OutboxMessage.objects.bulk_create([
+        OutboxMessage(task_name=task_name, args=list(args or []), kwargs=dict(kwargs or {}))
+        for task_name, args, kwargs in messages
+    ])
+
+
+def relay_outbox(batch_size=100):
+    """
+    Publica no Celery um lote de mensagens pendentes. Retorna quantas foram publicadas.
+
+    As linhas são travadas com SKIP LOCKED, então vários relays podem rodar em
+    paralelo sem publicar a mesma mensagem ao mesmo tempo.
+    """
+    from jota_project.celery import app
+
+    with transaction.atomic():
+        pending = list(
+            OutboxMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(dispatched_at__isnull=True)
+            .order_by('id')[:batch_size]
+        )
+        if not pending:
+            return 0
+
+        dispatched_ids = []
+        failed = []
+        for message in pending:
+            try:
+                app.send_task(message.task_name, args=message.args, kwargs=message.kwargs)
+            except Exception as e: # Broker indisponível, etc.: tenta de novo no próximo ciclo
+                message.attempts += 1
+                message.last_error = str(e)
+                failed.append(message)
+                break
+            dispatched_ids.append(message.id)
+
+        if dispatched_ids:
+            OutboxMessage.objects.filter(id__in=dispatched_ids).update(
+                dispatched_at=timezone.now()
+            )
+        if failed:
+            OutboxMessage.objects.bulk_update(failed, ['attempts', 'last_error'])
+
+    return len(dispatched_ids)
+
+
+def purge_dispatched(older_than=timedelta(days=7)):
+    """
+    Remove mensagens já publicadas há mais de `older_than`.
+    """
+    cutoff = timezone.now() - older_than
+    deleted, _ = OutboxMessage.objects.filter(dispatched_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,183 @@
+from functools import partial
+from math import ceil
+
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class LookaheadPage(Page):
+    """
+    Página cuja existência da próxima foi decidida pela linha a mais buscada pelo paginator.
+    """
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def end_index(self):
+        return (self.number - 1) * self.paginator.per_page + len(self.object_list)
+
+
+class LookaheadPaginator(Paginator):
+    """
+    Paginator cujo total (pré-calculado ou estimado, veja `get_total_count`) é só
+    informativo: nunca limita quais linhas são retornadas. Cada página busca
+    per_page + 1 linhas e a linha a mais decide se há próxima página. O `count`
+    é o maior entre o total e as linhas já vistas; na última página, o exato.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._rows_seen = 0
+        self._exact_count = None
+
+    def get_total_count(self):
+        return super().count
+
+    @cached_property
+    def _total_count(self):
+        return self.get_total_count()
+
+    @property
+    def count(self):
+        if self._exact_count is not None:
+            return self._exact_count
+        return max(self._total_count, self._rows_seen)
+
+    @property
+    def num_pages(self):
+        if self.count == 0 and not self.allow_empty_first_page:
+            return 0
+        return ceil(max(1, self.count) / self.per_page)
+
+    def validate_number(self, number):
+        # Como o do Django, mas sem limite superior: o total pode estar abaixo do real
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not rows and (number > 1 or not self.allow_empty_first_page):
+            raise EmptyPage(_("That page contains no results"))
+        if has_next:
+            self._rows_seen = max(self._rows_seen, bottom + len(rows) + 1)
+        else:
+            self._exact_count = bottom + len(rows)
+        return LookaheadPage(rows, number, self, has_next)
+
+
+class PrecomputedCountPaginator(LookaheadPaginator):
+    """
+    Paginator que usa um total já conhecido em vez de executar COUNT(*).
+    """
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._precomputed_count = count
+
+    def get_total_count(self):
+        if self._precomputed_count is None:
+            return super().get_total_count()
+        return self._precomputed_count
+
+
+class PrecomputedCountPagination(PageNumberPagination):
+    """
+    Paginação por número de página cujo total é informado pela view (ex.: contagens
+    pré-calculadas, que podem estar atrasadas: as páginas não são cortadas por ele).
+    """
+    page_size = 20
+
+    def paginate_queryset(self, queryset, request, view=None, count=None):
+        self.django_paginator_class = partial(PrecomputedCountPaginator, count=count)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class UserDirectoryPagination(CursorPagination):
+    """
+    Cursor sobre a chave primária: cada página é uma busca no índice, sem OFFSET nem COUNT(*).
+    """
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+# Abaixo disso a estimativa não compensa: a contagem exata é barata
+APPROXIMATE_COUNT_THRESHOLD = 10000
+
+
+def _table_row_estimate(connection, db_table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [db_table],
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+def _explain_row_estimate(connection, queryset):
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN {sql}", params)
+        columns = [column[0] for column in cursor.description]
+        first = dict(zip(columns, cursor.fetchone()))
+    if first.get('rows') is None:
+        return None
+    return int(first['rows'] * float(first.get('filtered') or 100) / 100)
+
+
+def approximate_count(queryset):
+    """
+    Total aproximado de um queryset, sem COUNT(*) em tabelas grandes (MySQL):
+    - sem filtros: estimativa de linhas da tabela (information_schema);
+    - com filtros: estimativa do otimizador (EXPLAIN).
+    Em outros bancos, ou quando a estimativa é pequena, faz a contagem exata.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'mysql':
+        if not queryset.query.where:
+            estimate = _table_row_estimate(connection, queryset.model._meta.db_table)
+        else:
+            estimate = _explain_row_estimate(connection, queryset)
+        if estimate is not None and estimate >= APPROXIMATE_COUNT_THRESHOLD:
+            return estimate
+    return queryset.count()
+
+
+class ApproximateCountPaginator(LookaheadPaginator):
+    """
+    Paginator que usa `approximate_count` (ex.: changelists do admin em tabelas grandes).
+    A estimativa só aparece no total exibido; as páginas vêm da consulta.
+    """
+    def get_total_count(self):
+        if hasattr(self.object_list, 'query'):
+            return approximate_count(self.object_list)
+        return super().get_total_count()
+
+
+class ApproximateCountPagination(PrecomputedCountPagination):
+    """
+    Como `PrecomputedCountPagination`, mas sem total informado pela view usa
+    `approximate_count` em vez de COUNT(*). O `count` da resposta é max(total, linhas vistas).
+    """
+    def paginate_queryset(self, queryset, request, view=None, count=None):
+        if count is None:
+            count = approximate_count(queryset)
+        return super().paginate_queryset(queryset, request, view, count=count)
@@ -0,0 +1,17 @@
+import redis
+from django.conf import settings
+
+_connection = None
+
+
+def get_redis_connection():
+    """
+    Retorna a conexão Redis compartilhada do processo (usada por contadores, rankings, etc.).
+
+    O pool de conexões do redis-py é seguro após fork, então a instância pode
+    ser reaproveitada pelos processos filhos dos workers.
+    """
+    global _connection
+    if _connection is None:
+        _connection = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _connection
@@ -0,0 +1,309 @@
+"""
+Cálculo das notícias relacionadas ("leia também").
+
+Cada notícia publicada vira um vetor TF-IDF (matriz esparsa do SciPy) montado a
+partir de título, subtítulo e conteúdo. A similaridade é o cosseno entre os
+vetores, combinado com a sobreposição de verticais. Os top-k vizinhos de cada
+notícia ficam gravados em `RelatedNews`, então o endpoint só faz uma consulta
+indexada.
+
+O cálculo é incremental: `update_related_news(ids)` compara apenas as notícias
+informadas com o corpus (custo O(novas x corpus), não O(corpus²)) e encaixa as
+novas nas listas das notícias antigas quando elas entram no top-k.
+
+Montar o corpus (tokenizar e vetorizar até `CORPUS_MAX_SIZE` notícias) é a
+parte cara, então as views não disparam um cálculo por publicação/edição:
+`refresh_related_news`, executado periodicamente pelo beat, junta numa única
+chamada tudo o que foi publicado ou alterado desde a execução anterior (pelo
+cursor (updated_at, id) guardado no Redis) e as notícias que ainda não têm
+relacionadas. O corpus é montado no máximo uma vez por execução.
+"""
+import json
+import math
+import re
+from collections import Counter
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from scipy import sparse
+
+from .models import News, RelatedNews
+from .redis_client import get_redis_connection
+
+# Quantas relacionadas guardar por notícia
+RELATED_NEWS_TOP_K = 10
+# Peso da sobreposição de verticais na similaridade final (0 = só texto)
+VERTICAL_WEIGHT = 0.3
+# Abaixo disso a notícia não é considerada relacionada
+MIN_SCORE = 0.05
+# Corpus considerado: notícias publicadas no período, limitado em quantidade
+CORPUS_HORIZON = timedelta(days=365)
+CORPUS_MAX_SIZE = 20000
+# Quantas notícias-alvo comparar com o corpus por vez (limita a matriz densa)
+TARGET_CHUNK_SIZE = 200
+# Cursor (updated_at, id) até onde as alterações já foram processadas por refresh_related_news
+RELATED_WATERMARK_KEY = 'news:related:watermark'
+# Máximo de notícias alteradas por execução; o restante fica para a próxima
+REFRESH_BATCH_SIZE = 1000
+# Alterações mais recentes que isso esperam a próxima execução (transações ainda em andamento)
+REFRESH_SAFETY_LAG = timedelta(seconds=5)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset("""
+    que com para por uma uns umas dos das nos nas pelo pela pelos pelas aos como mais mas
+    foi ser são sua seu suas seus ele ela eles elas isso isto esse essa este esta entre
+    sobre sem também quando onde não tem após até the and for
+""".split())
+
+
+def tokenize(text):
+    return [
+        token for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 2 and not token.isdigit() and token not in STOPWORDS
+    ]
+
+
+def news_tokens(title, subtitle, content):
+    """
+    Tokens de uma notícia; título e subtítulo pesam mais que o corpo.
+    """
+    return tokenize(title) * 3 + tokenize(subtitle) * 2 + tokenize(content)
+
+
+def build_tfidf_matrix(documents):
+    """
+    Monta a matriz TF-IDF (CSR, linhas normalizadas em L2) de uma lista de
+    documentos já tokenizados. TF sublinear (1 + log tf), IDF suavizado.
+    """
+    vocabulary = {}
+    rows, cols, values = [], [], []
+    for row, tokens in enumerate(documents):
+        for token, count in Counter(tokens).items():
+            rows.append(row)
+            cols.append(vocabulary.setdefault(token, len(vocabulary)))
+            values.append(1.0 + math.log(count))
+
+    n_docs = len(documents)
+    tf = sparse.csr_matrix((values, (rows, cols)), shape=(n_docs, len(vocabulary)), dtype=np.float64)
+    df = np.bincount(tf.indices, minlength=len(vocabulary))
+    idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+    return _normalize_rows(tf @ sparse.diags(idf))
+
+
+def build_vertical_matrix(vertical_sets):
+    """
+    Matriz esparsa notícia x vertical (binária, linhas normalizadas em L2):
+    o produto escalar entre duas linhas é o cosseno entre os conjuntos de verticais.
+    """
+    columns = {}
+    rows, cols = [], []
+    for row, verticals in enumerate(vertical_sets):
+        for vertical_id in verticals:
+            rows.append(row)
+            cols.append(columns.setdefault(vertical_id, len(columns)))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)), shape=(len(vertical_sets), max(len(columns), 1))
+    )
+    return _normalize_rows(matrix)
+
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix)
+
+
+def top_k_similar(text_matrix, vertical_matrix, target_rows, k=RELATED_NEWS_TOP_K):
+    """
+    Para cada linha em `target_rows`, retorna [(linha_vizinha, score)] com os k
+    vizinhos mais parecidos do corpus (excluindo a própria linha).
+    """
+    results = {}
+    for start in range(0, len(target_rows), TARGET_CHUNK_SIZE):
+        chunk = target_rows[start:start + TARGET_CHUNK_SIZE]
+        scores = (1.0 - VERTICAL_WEIGHT) * (text_matrix[chunk] @ text_matrix.T).toarray()
+        scores += VERTICAL_WEIGHT * (vertical_matrix[chunk] @ vertical_matrix.T).toarray()
+        scores[np.arange(len(chunk)), chunk] = -np.inf # Ignora a própria notícia
+
+        kk = min(k, scores.shape[1] - 1)
+        if kk <= 0:
+            results.update({row: [] for row in chunk})
+            continue
+        candidates = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+        for i, row in enumerate(chunk):
+            ordered = sorted(candidates[i], key=lambda col: -scores[i, col])
+            results[row] = [(int(col), float(scores[i, col])) for col in ordered if scores[i, col] >= MIN_SCORE]
+    return results
+
+
+def _load_corpus(extra_ids=()):
+    """
+    Carrega o corpus de notícias publicadas (ids, tokens, verticais). As notícias
+    em `extra_ids` entram mesmo que estejam fora do horizonte.
+    """
+    since = timezone.now() - CORPUS_HORIZON
+    ids = list(
+        News.objects.filter(status=News.Status.PUBLISHED, publication_date__gte=since)
+        .order_by('-publication_date').values_list('id', flat=True)[:CORPUS_MAX_SIZE]
+    )
+    ids = list(dict.fromkeys(ids + list(extra_ids)))
+
+    texts = {
+        news_id: news_tokens(title, subtitle, content)
+        for news_id, title, subtitle, content in News.objects.filter(
+            id__in=ids, status=News.Status.PUBLISHED
+        ).values_list('id', 'title', 'subtitle', 'content').iterator()
+    }
+    ids = [news_id for news_id in ids if news_id in texts]
+    verticals = {news_id: set() for news_id in ids}
+    for news_id, vertical_id in News.verticals.through.objects.filter(
+        news_id__in=ids
+    ).values_list('news_id', 'vertical_id'):
+        verticals[news_id].add(vertical_id)
+
+    return ids, [texts[news_id] for news_id in ids], [verticals[news_id] for news_id in ids]
+
+
+def _write_related(lists):
+    """
+    Substitui as relacionadas das notícias em `lists` ({news_id: [(related_id, score)]}).
+    """
+    with transaction.atomic():
+        RelatedNews.objects.filter(news_id__in=lists).delete()
+        RelatedNews.objects.bulk_create([
+            RelatedNews(news_id=news_id, related_id=related_id, score=score, rank=rank)
+            for news_id, neighbors in lists.items()
+            for rank, (related_id, score) in enumerate(neighbors)
+        ], batch_size=1000)
+
+
+def update_related_news(news_ids, k=RELATED_NEWS_TOP_K):
+    """
+    Calcula as relacionadas das notícias `news_ids` e as encaixa no top-k das
+    notícias antigas que ficaram mais parecidas com elas.
+    """
+    ids, documents, vertical_sets = _load_corpus(extra_ids=news_ids)
+    row_of = {news_id: row for row, news_id in enumerate(ids)}
+    target_rows = [row_of[news_id] for news_id in news_ids if news_id in row_of]
+    if not target_rows:
+        return 0
+
+    neighbors = top_k_similar(build_tfidf_matrix(documents), build_vertical_matrix(vertical_sets), target_rows, k)
+    lists = {
+        ids[row]: [(ids[col], score) for col, score in found]
+        for row, found in neighbors.items()
+    }
+
+    # Atualização reversa: a notícia nova pode entrar no top-k das antigas
+    targets = set(lists)
+    reverse = {}
+    for news_id, found in lists.items():
+        for related_id, score in found:
+            if related_id not in targets:
+                reverse.setdefault(related_id, []).append((news_id, score))
+
+    current = {}
+    for news_id, related_id, score in RelatedNews.objects.filter(
+        news_id__in=reverse
+    ).values_list('news_id', 'related_id', 'score'):
+        current.setdefault(news_id, {})[related_id] = score
+
+    for news_id, candidates in reverse.items():
+        merged = dict(current.get(news_id, {}))
+        existing_top = set(merged)
+        merged.update(candidates)
+        top = sorted(merged.items(), key=lambda item: -item[1])[:k]
+        if {related_id for related_id, _ in top} != existing_top or len(top) != len(existing_top):
+            lists[news_id] = top
+
+    _write_related(lists)
+    return len(targets)
+
+
+def rebuild_related_news(k=RELATED_NEWS_TOP_K):
+    """
+    Recalcula as relacionadas de todo o corpus (carga inicial ou mudança de parâmetros).
+    """
+    ids, documents, vertical_sets = _load_corpus()
+    if not ids:
+        return 0
+    text_matrix = build_tfidf_matrix(documents)
+    vertical_matrix = build_vertical_matrix(vertical_sets)
+
+    for start in range(0, len(ids), TARGET_CHUNK_SIZE):
+        rows = list(range(start, min(start + TARGET_CHUNK_SIZE, len(ids))))
+        neighbors = top_k_similar(text_matrix, vertical_matrix, rows, k)
+        _write_related({
+            ids[row]: [(ids[col], score) for col, score in found]
+            for row, found in neighbors.items()
+        })
+    return len(ids)
+
+
+def news_missing_related(since=timedelta(days=2), limit=TARGET_CHUNK_SIZE):
+    """
+    Notícias publicadas recentemente que ainda não têm relacionadas calculadas
+    (ex.: publicadas pelo agendamento, que não passa pelas views).
+    """
+    return list(
+        News.objects.filter(
+            status=News.Status.PUBLISHED,
+            publication_date__gte=timezone.now() - since,
+            related_entries__isnull=True,
+        ).order_by('-publication_date').values_list('id', flat=True)[:limit]
+    )
+
+
+def news_changed_since(cursor, until, limit=REFRESH_BATCH_SIZE):
+    """
+    Notícias publicadas alteradas depois de `cursor` e até `until`, em ordem de
+    (updated_at, id): ([ids], próximo cursor).
+
+    O cursor é (updated_at, id) da última notícia lida; id None quando todas as
+    notícias daquele instante já foram lidas. Com o id, um lote cheio de notícias
+    com o mesmo updated_at (ex.: publicação em lote, um único UPDATE) não se repete.
+    """
+    updated_at, last_id = cursor
+    changed = News.objects.filter(status=News.Status.PUBLISHED, updated_at__lte=until)
+    if last_id is None:
+        changed = changed.filter(updated_at__gt=updated_at)
+    else:
+        changed = changed.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=last_id))
+    changed = list(changed.order_by('updated_at', 'id').values_list('id', 'updated_at')[:limit])
+    # Lote cheio: a próxima execução continua logo depois da última notícia lida
+    next_cursor = (changed[-1][1], changed[-1][0]) if len(changed) == limit else (until, None)
+    return [news_id for news_id, _ in changed], next_cursor
+
+
+def _load_watermark(raw, default):
+    if not raw:
+        return default
+    try:
+        payload = json.loads(raw)
+        return parse_datetime(payload['u']), payload['i']
+    except (ValueError, KeyError, TypeError):
+        # Formato antigo: só o updated_at (isoformat)
+        updated_at = parse_datetime(raw.decode() if isinstance(raw, bytes) else raw)
+        return (updated_at, 0) if updated_at else default
+
+
+def refresh_related_news():
+    """
+    Calcula, numa única passada sobre o corpus, as relacionadas das notícias
+    alteradas desde a execução anterior e das que ainda não as têm. Retorna
+    quantas notícias foram calculadas.
+    """
+    connection = get_redis_connection()
+    now = timezone.now()
+    cursor = _load_watermark(connection.get(RELATED_WATERMARK_KEY), (now - timedelta(days=2), None))
+    changed_ids, (updated_at, last_id) = news_changed_since(cursor, now - REFRESH_SAFETY_LAG, REFRESH_BATCH_SIZE)
+
+    news_ids = list(dict.fromkeys(changed_ids + news_missing_related()))
+    updated = update_related_news(news_ids) if news_ids else 0
+    # Só avança a marca depois do cálculo: se ele falhar, a próxima execução refaz o lote
+    connection.set(RELATED_WATERMARK_KEY, json.dumps({'u': updated_at.isoformat(), 'i': last_id}))
+    return updated
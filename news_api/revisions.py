@@ -0,0 +1,168 @@
+"""
+Histórico de revisões das notícias.
+
+Cada edição feita pelo NewsSerializer grava uma `NewsRevision` com um único
+INSERT. A maioria das revisões guarda só o que mudou em relação à anterior
+(o novo valor dos campos curtos e, para o `content`, as operações de um diff
+por palavras), em JSON comprimido com zlib. A cada `SNAPSHOT_INTERVAL`
+revisões, ou quando o diff sairia quase do tamanho do texto, grava-se o
+documento completo: reconstruir qualquer revisão lê no máximo
+`SNAPSHOT_INTERVAL` linhas, em uma consulta.
+"""
+import difflib
+import json
+import re
+import zlib
+
+from .models import News, NewsRevision
+
+REVISION_FIELDS = ('title', 'subtitle', 'content', 'status', 'verticals')
+SNAPSHOT_INTERVAL = 20
+# Diff maior que essa fração do documento completo (comprimidos) não compensa
+SNAPSHOT_RATIO = 0.5
+
+_token_re = re.compile(r'\S+\s*|\s+')
+
+
+def revision_document(news, vertical_ids=None):
+    """
+    Campos versionados de uma notícia (serializável em JSON).
+    """
+    if vertical_ids is None:
+        vertical_ids = news.verticals.values_list('id', flat=True)
+    return {
+        'title': news.title,
+        'subtitle': news.subtitle,
+        'content': news.content,
+        'status': news.status,
+        'verticals': sorted(vertical_ids),
+    }
+
+
+def _pack(payload):
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode())
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def diff_text(old, new):
+    """
+    Operações [início, fim, tokens novos] que transformam `old` em `new`, sobre os tokens (palavras) de `old`.
+    """
+    old_tokens, new_tokens = _token_re.findall(old), _token_re.findall(new)
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens)
+    return [
+        [i1, i2, ''.join(new_tokens[j1:j2])]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal'
+    ]
+
+
+def patch_text(old, operations):
+    tokens = _token_re.findall(old)
+    # De trás para frente: os índices das operações anteriores continuam válidos
+    for start, end, replacement in reversed(operations):
+        tokens[start:end] = [replacement]
+    return ''.join(tokens)
+
+
+def make_delta(previous, document):
+    delta = {}
+    for field in REVISION_FIELDS:
+        if previous[field] == document[field]:
+            continue
+        if field == 'content' and previous['content'] and document['content']:
+            delta['content_ops'] = diff_text(previous['content'], document['content'])
+        else:
+            delta[field] = document[field]
+    return delta
+
+
+def apply_delta(document, delta):
+    document = dict(document)
+    if 'content_ops' in delta:
+        document['content'] = patch_text(document['content'], delta['content_ops'])
+    for field in REVISION_FIELDS:
+        if field in delta:
+            document[field] = delta[field]
+    return document
+
+
+def _rebuild(rows):
+    """
+    Documento da revisão mais recente de `rows` [(number, is_snapshot, data)],
+    ordenadas da mais recente para a mais antiga, a partir do último snapshot.
+    """
+    for index, (_, is_snapshot, _) in enumerate(rows):
+        if is_snapshot:
+            break
+    else:
+        raise ValueError("Histórico sem snapshot no intervalo esperado.")
+    document = None
+    for _, is_snapshot, data in reversed(rows[:index + 1]):
+        document = _unpack(data) if is_snapshot else apply_delta(document, _unpack(data))
+    return document
+
+
+def _changed_fields(previous, document):
+    return [field for field in REVISION_FIELDS if previous is None or previous[field] != document[field]]
+
+
+def record_revision(news, document, author=None, baseline=None):
+    """
+    Grava a revisão com o estado `document` (de `revision_document`), com um único INSERT.
+    Deve ser chamada dentro de uma transação.
+
+    `baseline` é o estado anterior à edição: se a notícia ainda não tem histórico
+    (ex.: criada antes das revisões), ele entra como revisão 1 no mesmo INSERT.
+    Retorna a revisão gravada, ou None se nenhum campo versionado mudou.
+    """
+    # Trava a linha da notícia: serializa edições concorrentes mesmo quando ainda não
+    # há revisões (um FOR UPDATE sobre zero linhas não trava nada)
+    News.objects.select_for_update().only('id').get(pk=news.pk)
+    # Leitura com FOR UPDATE: vê o último número já commitado, não o snapshot da transação
+    recent = list(
+        NewsRevision.objects.select_for_update().filter(news=news)
+        .order_by('-number').values_list('number', 'is_snapshot', 'data')[:SNAPSHOT_INTERVAL]
+    )
+    revisions = []
+    if recent:
+        number, previous = recent[0][0] + 1, _rebuild(recent)
+    elif baseline is not None and baseline != document:
+        revisions.append(NewsRevision(
+            news=news, number=1, is_snapshot=True, changed_fields=list(REVISION_FIELDS), data=_pack(baseline)
+        ))
+        number, previous = 2, baseline
+    else:
+        number, previous = 1, None
+
+    if previous == document:
+        return None
+    snapshot = _pack(document)
+    data, is_snapshot = snapshot, True
+    if previous is not None and (number - 1) % SNAPSHOT_INTERVAL:
+        delta = _pack(make_delta(previous, document))
+        if len(delta) < len(snapshot) * SNAPSHOT_RATIO:
+            data, is_snapshot = delta, False
+
+    revision = NewsRevision(
+        news=news, number=number, author=author, is_snapshot=is_snapshot,
+        changed_fields=_changed_fields(previous, document), data=data,
+    )
+    revisions.append(revision)
+    NewsRevision.objects.bulk_create(revisions)
+    return revision
+
+
+def get_revision_document(news_id, number):
+    """
+    Documento completo da revisão `number`, ou None se ela não existe.
+    """
+    rows = list(
+        NewsRevision.objects.filter(news_id=news_id, number__lte=number, number__gt=number - SNAPSHOT_INTERVAL)
+        .order_by('-number').values_list('number', 'is_snapshot', 'data')
+    )
+    if not rows or rows[0][0] != number:
+        return None
+    return _rebuild(rows)
@@ -0,0 +1,223 @@
+"""
+Schema OpenAPI pré-gerado.
+
+Gerar o schema com o drf-spectacular introspecta todas as views e serializers
+(centenas de ms de CPU por requisição). Aqui ele é gerado uma vez por versão do
+código — no deploy, com `manage.py build_openapi_schema`, ou no primeiro acesso —
+e guardado em disco e no cache compartilhado. As rotas servem os bytes prontos
+(YAML ou JSON, com a versão gzip já calculada) com ETag.
+
+O drf-spectacular só é importado quando o schema precisa ser gerado ou na
+primeira renderização das páginas do Swagger/ReDoc, nunca na carga do urls.py.
+"""
+import gzip
+import hashlib
+import os
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
+
+SCHEMA_FORMATS = {
+    'yaml': 'application/vnd.oai.openapi',
+    'json': 'application/vnd.oai.openapi+json',
+}
+# Negociação pelo cabeçalho Accept, na ordem de preferência do SpectacularAPIView
+ACCEPTED_MEDIA_TYPES = (
+    ('application/vnd.oai.openapi+json', 'json'),
+    ('application/json', 'json'),
+    ('application/vnd.oai.openapi', 'yaml'),
+    ('application/yaml', 'yaml'),
+)
+
+accepts_gzip = re.compile(r'\bgzip\b')
+
+_documents = {}
+_lock = threading.Lock()
+
+
+class SchemaDocument:
+    """
+    Conteúdo pronto para servir: bytes, versão gzip e ETag.
+    """
+    def __init__(self, content, content_type, headers=None):
+        self.content = content
+        self.gzipped = gzip.compress(content, mtime=0)
+        self.content_type = content_type
+        self.headers = headers or {}
+        self.etag = f'"{hashlib.sha1(content).hexdigest()}"'
+
+
+@lru_cache(maxsize=None)
+def _source_fingerprint():
+    digest = hashlib.sha1()
+    for package in ('news_api', 'jota_project'):
+        for path in sorted(Path(settings.BASE_DIR, package).rglob('*.py')):
+            if 'migrations' in path.parts or path.name == 'tests.py':
+                continue
+            digest.update(path.read_bytes())
+    digest.update(repr(sorted(settings.SPECTACULAR_SETTINGS.items())).encode())
+    return digest.hexdigest()[:12]
+
+
+def schema_version():
+    """
+    Versão do código usada no nome do arquivo e na chave do cache.
+    """
+    return settings.APP_VERSION or _source_fingerprint()
+
+
+def schema_path(fmt, version=None):
+    return Path(settings.OPENAPI_SCHEMA_DIR, f'openapi-{version or schema_version()}.{fmt}')
+
+
+def _cache_key(fmt, version):
+    return f'openapi:schema:{version}:{fmt}'
+
+
+def generate_schema():
+    """
+    Gera o schema (introspecção completa) e o renderiza em todos os formatos: {formato: bytes}.
+    """
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=spectacular_settings.SERVE_PUBLIC)
+    return {
+        'yaml': OpenApiYamlRenderer().render(schema, renderer_context={}),
+        'json': OpenApiJsonRenderer().render(schema, renderer_context={}),
+    }
+
+
+def build_schema():
+    """
+    Gera o schema da versão atual, grava os arquivos e aquece o cache. Retorna os caminhos gravados.
+    """
+    version = schema_version()
+    contents = generate_schema()
+    Path(settings.OPENAPI_SCHEMA_DIR).mkdir(parents=True, exist_ok=True)
+    paths = []
+    for fmt, content in contents.items():
+        path = schema_path(fmt, version)
+        # Escreve em arquivo temporário e renomeia: workers lendo nunca veem arquivo pela metade
+        tmp_path = path.with_name(f'.{path.name}.{os.getpid()}')
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
+        paths.append(path)
+    cache.set_many({_cache_key(fmt, version): content for fmt, content in contents.items()}, timeout=None)
+    return paths
+
+
+def _load_schema(fmt, version):
+    """
+    Bytes do schema: arquivo gerado no deploy, depois o cache, por último gera na hora.
+    """
+    try:
+        return schema_path(fmt, version).read_bytes()
+    except FileNotFoundError:
+        pass
+    content = cache.get(_cache_key(fmt, version))
+    if content is None:
+        contents = generate_schema()
+        cache.set_many({_cache_key(key, version): value for key, value in contents.items()}, timeout=None)
+        content = contents[fmt]
+    return content
+
+
+def get_schema_document(fmt):
+    version = schema_version()
+    key = ('schema', version, fmt)
+    document = _documents.get(key)
+    if document is None:
+        # Um único gerador por processo; as demais requisições esperam o resultado
+        with _lock:
+            document = _documents.get(key)
+            if document is None:
+                document = _documents[key] = SchemaDocument(_load_schema(fmt, version), SCHEMA_FORMATS[fmt])
+    return document
+
+
+def _negotiate_format(request):
+    fmt = request.GET.get('format')
+    if fmt in SCHEMA_FORMATS:
+        return fmt
+    accept = request.META.get('HTTP_ACCEPT', '')
+    for media_type, fmt in ACCEPTED_MEDIA_TYPES:
+        if media_type in accept:
+            return fmt
+    return 'yaml'
+
+
+def _serve(request, document, vary=()):
+    """
+    Resposta com ETag (304 se o cliente já tem a versão) e gzip quando aceito.
+    """
+    gzipped = bool(accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+    etag = f'{document.etag[:-1]}-gzip"' if gzipped else document.etag
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        content = b'' if request.method == 'HEAD' else (document.gzipped if gzipped else document.content)
+        response = HttpResponse(content, content_type=document.content_type)
+        response['Content-Length'] = str(len(document.gzipped if gzipped else document.content))
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        for name, value in document.headers.items():
+            response[name] = value
+    response['ETag'] = etag
+    # Cliente/proxy pode guardar, mas revalida (barato: 304) para pegar um deploy novo
+    patch_cache_control(response, public=True, no_cache=True)
+    patch_vary_headers(response, ('Accept-Encoding',) + tuple(vary))
+    return response
+
+
+@require_safe
+def schema_view(request):
+    fmt = _negotiate_format(request)
+    document = get_schema_document(fmt)
+    filename = settings.SPECTACULAR_SETTINGS.get('TITLE') or 'schema'
+    response = _serve(request, document, vary=('Accept',))
+    response['Content-Disposition'] = f'inline; filename="{filename}.{fmt}"'
+    return response
+
+
+def _ui_cache_key(view_name, request):
+    """
+    Chave do cache da página, ou None quando a query tem opções que não vale a pena guardar.
+    """
+    lang = request.GET.get('lang')
+    if set(request.GET) - {'lang'} or (lang and lang not in dict(settings.LANGUAGES)):
+        return None
+    return (view_name, schema_version(), lang)
+
+
+def ui_view(view_name):
+    """
+    Página do Swagger UI/ReDoc, renderizada uma vez por processo (e por idioma).
+    """
+    @require_safe
+    def view(request):
+        key = _ui_cache_key(view_name, request)
+        document = _documents.get(key) if key else None
+        if document is None:
+            from drf_spectacular import views
+
+            response = getattr(views, view_name).as_view(url_name='schema')(request)
+            response.render()
+            if response.status_code != 200:
+                return response
+            headers = {}
+            if response.has_header('Cross-Origin-Opener-Policy'):
+                headers['Cross-Origin-Opener-Policy'] = response['Cross-Origin-Opener-Policy']
+            document = SchemaDocument(response.content, response['Content-Type'], headers)
+            if key:
+                _documents[key] = document
+        return _serve(request, document)
+    return view
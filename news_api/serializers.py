@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from django.utils import timezone
-from .models import User, News, Vertical, Plan, UserPlan
+from .models import User, News, Vertical, Plan, UserPlan, NewsRevision
 from django.contrib.auth.hashers import make_password
+from .lifecycle import news_state, record_news_change
+from .revisions import record_revision, revision_document
 
 class VerticalSerializer(serializers.ModelSerializer):
     class Meta:
@@ -64,6 +66,52 @@ class UserSerializer(serializers.ModelSerializer):
         return super(UserSerializer, self).update(instance, validated_data)
 
 
+class UserDirectorySerializer(serializers.ModelSerializer):
+    """
+    Usuário no diretório: o plano vai só como id (os dados dos planos vêm uma vez
+    por página, no mapa `plans` da resposta).
+    """
+    plan = serializers.SerializerMethodField()
+    plan_start_date = serializers.SerializerMethodField()
+    plan_end_date = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = [
+            'id', 'username', 'email', 'role', 'is_staff', 'is_active',
+            'plan', 'plan_start_date', 'plan_end_date',
+        ]
+
+    def _subscription(self, obj):
+        try:
+            return obj.plan_subscription
+        except UserPlan.DoesNotExist:
+            return None
+
+    def get_plan(self, obj):
+        subscription = self._subscription(obj)
+        return subscription.plan_id if subscription else None
+
+    def get_plan_start_date(self, obj):
+        subscription = self._subscription(obj)
+        return subscription.start_date if subscription else None
+
+    def get_plan_end_date(self, obj):
+        subscription = self._subscription(obj)
+        return subscription.end_date if subscription else None
+
+
+class UserDirectoryFilterSerializer(serializers.Serializer):
+    """
+    Filtros (query string) do diretório de usuários.
+    """
+    role = serializers.ChoiceField(choices=User.Role.choices, required=False)
+    plan = serializers.IntegerField(required=False)
+    is_active = serializers.BooleanField(required=False, allow_null=True, default=None)
+    expires_before = serializers.DateField(required=False) # Assinatura vence antes da data
+    expires_after = serializers.DateField(required=False) # Assinatura vence na data ou depois
+
+
 class NewsSerializer(serializers.ModelSerializer):
     # Mostrar nome do autor e detalhes das verticais ao invés de apenas IDs
     author = serializers.SlugRelatedField(slug_field='username', read_only=True)
@@ -82,9 +130,9 @@ class NewsSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'subtitle', 'image', 'content',
             'publication_date', 'scheduled_publish_date', 'author',
-            'status', 'status_display', 'verticals', 'vertical_ids', 'is_pro'
+            'status', 'status_display', 'verticals', 'vertical_ids', 'is_pro', 'updated_at'
         ]
-        read_only_fields = ['publication_date', 'author'] # Definidos automaticamente ou com lógica específica
+        read_only_fields = ['publication_date', 'author', 'updated_at'] # Definidos automaticamente ou com lógica específica
 
     def create(self, validated_data):
         # Atribuir o usuário autenticado como autor ao criar notícia
@@ -107,10 +155,15 @@ class NewsSerializer(serializers.ModelSerializer):
 
 
         # publication_date é setado pelo default=timezone.now no modelo ou pela lógica de agendamento acima
+        vertical_ids = [vertical.id for vertical in validated_data.get('verticals', [])]
         news = super().create(validated_data)
+        record_news_change(news.id, None, news_state(news, vertical_ids))
+        record_revision(news, revision_document(news, vertical_ids), author=validated_data['author'])
         return news
 
     def update(self, instance, validated_data):
+        before = news_state(instance)
+        baseline = revision_document(instance, before['verticals'])
         # Lógica similar à criação para status/agendamento ao atualizar
         scheduled_date = validated_data.get('scheduled_publish_date', instance.scheduled_publish_date)
         current_status = validated_data.get('status', instance.status)
@@ -130,9 +183,23 @@ class NewsSerializer(serializers.ModelSerializer):
              validated_data['scheduled_publish_date'] = None # Limpa agendamento
 
         news = super().update(instance, validated_data)
+        after = news_state(news)
+        record_news_change(news.id, before, after)
+        record_revision(
+            news, revision_document(news, after['verticals']),
+            author=self.context['request'].user, baseline=baseline,
+        )
         return news
 
 
+class NewsRevisionSerializer(serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(slug_field='username', read_only=True)
+
+    class Meta:
+        model = NewsRevision
+        fields = ['number', 'author', 'created_at', 'changed_fields', 'is_snapshot']
+
+
 class UserPlanSerializer(serializers.ModelSerializer):
     user = serializers.SlugRelatedField(slug_field='username', queryset=User.objects.filter(role=User.Role.READER))
     plan = serializers.SlugRelatedField(slug_field='name', queryset=Plan.objects.all())
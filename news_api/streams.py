@@ -0,0 +1,289 @@
+"""
+Stream SSE (Server-Sent Events) de notícias recém-publicadas.
+
+Fluxo:
+- Quando uma notícia passa a PUBLISHED (serializer ou promoção das agendadas),
+  lifecycle.py grava na outbox a task `send_notification_news_published_task`.
+- A task chama `publish_news_events`, que faz XADD em um Redis Stream (histórico
+  curto, usado para retomar via Last-Event-ID) e PUBLISH no canal de pub/sub.
+- Cada processo web mantém uma única assinatura do canal (`_Broadcaster`) e
+  repassa os eventos para as conexões SSE abertas nele, filtrando pelo plano de
+  cada leitor. Qualquer nó web atende qualquer assinante.
+- O plano do leitor é relido a cada `ENTITLEMENT_REFRESH_INTERVAL` (troca ou
+  rebaixamento de plano vale para conexões já abertas) e a conexão é encerrada
+  quando o token JWT expira: o cliente reconecta com um token novo.
+
+O app ASGI `NewsStreamApp` é montado em jota_project/asgi.py.
+"""
+import asyncio
+import json
+import logging
+import time
+from urllib.parse import parse_qs
+
+import redis
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import News
+from .redis_client import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+NEWS_STREAM_PATH = '/api/news/stream/'
+EVENTS_STREAM_KEY = 'news:events'
+EVENTS_CHANNEL = 'news:events:live'
+# Quantos eventos o histórico (para Last-Event-ID) guarda, aproximadamente
+EVENTS_STREAM_MAXLEN = 1000
+# Máximo de eventos reenviados ao retomar uma conexão
+REPLAY_LIMIT = 500
+HEARTBEAT_INTERVAL = 15
+# Conexão lenta demais é encerrada; o cliente reconecta e retoma via Last-Event-ID
+SUBSCRIBER_QUEUE_SIZE = 100
+# De quanto em quanto tempo (s) o acesso de uma conexão aberta é recalculado
+ENTITLEMENT_REFRESH_INTERVAL = 60
+
+
+def published_event(news_id, state):
+    """
+    Payload leve do evento "published" a partir do estado de lifecycle.news_state.
+    """
+    return {
+        'id': news_id,
+        'title': state['title'],
+        'verticals': state['verticals'],
+        'is_pro': state['is_pro'],
+    }
+
+
+def publish_news_events(events):
+    """
+    Registra os eventos no histórico e os publica para todos os nós web.
+    """
+    conn = get_redis_connection()
+    for event in events:
+        data = json.dumps(event, separators=(',', ':'))
+        event_id = conn.xadd(
+            EVENTS_STREAM_KEY, {'data': data}, maxlen=EVENTS_STREAM_MAXLEN, approximate=True
+        )
+        conn.publish(EVENTS_CHANNEL, json.dumps({'id': event_id, 'data': data}, separators=(',', ':')))
+
+
+def should_deliver(entitlement, event):
+    return entitlement.can_see(News.Status.PUBLISHED, event['is_pro'], event['verticals'])
+
+
+def format_sse(event_id, data, event='published'):
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n".encode()
+
+
+def _stream_id_key(event_id):
+    milliseconds, _, sequence = event_id.partition('-')
+    return int(milliseconds), int(sequence or 0)
+
+
+class _Broadcaster:
+    """
+    Uma assinatura de pub/sub por processo, repassada para as filas das conexões.
+    """
+    def __init__(self):
+        self._queues = set()
+        self._task = None
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        return self._client
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._queues.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._queues.discard(queue)
+
+    async def _listen(self):
+        while self._queues:
+            try:
+                pubsub = self.client.pubsub()
+                await pubsub.subscribe(EVENTS_CHANNEL)
+                try:
+                    while self._queues:
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=HEARTBEAT_INTERVAL)
+                        if message is not None:
+                            self._dispatch(message['data'])
+                finally:
+                    await pubsub.close()
+            except redis.RedisError:
+                logger.warning("Assinatura do canal de eventos perdida; reconectando.", exc_info=True)
+                await asyncio.sleep(1)
+
+    def _dispatch(self, raw):
+        for queue in list(self._queues):
+            try:
+                queue.put_nowait(raw)
+            except asyncio.QueueFull:
+                # Sinaliza para a conexão encerrar; o cliente retoma pelo Last-Event-ID
+                self._queues.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+
+broadcaster = _Broadcaster()
+
+
+def _entitlement_for_token(raw_token):
+    """
+    Autentica o token JWT (se houver) e resolve o acesso do usuário. Roda em thread (ORM síncrono).
+
+    Retorna (acesso, expiração do token em epoch ou None), ou (None, None) se o token é inválido.
+    """
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+    from .entitlements import entitlement_for
+
+    close_old_connections()
+    try:
+        if not raw_token:
+            return entitlement_for(None), None
+        authentication = JWTAuthentication()
+        try:
+            validated_token = authentication.get_validated_token(raw_token)
+            user = authentication.get_user(validated_token)
+        except (InvalidToken, TokenError):
+            return None, None
+        return entitlement_for(user), validated_token.get('exp')
+    finally:
+        close_old_connections()
+
+
+class NewsStreamApp:
+    """
+    App ASGI do endpoint SSE. Autenticação por `Authorization: Bearer <jwt>` ou
+    `?token=<jwt>` (o EventSource do navegador não envia cabeçalhos).
+    Retomada via cabeçalho `Last-Event-ID` ou `?last_event_id=`.
+    """
+    async def __call__(self, scope, receive, send):
+        if scope['method'] not in ('GET', 'HEAD'):
+            await self._reply(send, 405, "Método não permitido.")
+            return
+
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        query = parse_qs(scope.get('query_string', b'').decode())
+        raw_token = query.get('token', [None])[0]
+        authorization = headers.get('authorization', '')
+        if authorization.lower().startswith('bearer '):
+            raw_token = authorization[7:].strip()
+        last_event_id = headers.get('last-event-id') or query.get('last_event_id', [None])[0]
+
+        entitlement, expires_at = await sync_to_async(_entitlement_for_token)(raw_token)
+        if entitlement is None:
+            await self._reply(send, 401, "Token inválido ou expirado.")
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'), # Desliga o buffer de proxies (nginx)
+            ],
+        })
+        if scope['method'] == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        queue = broadcaster.subscribe() # Assina antes do replay para não perder eventos no meio
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        try:
+            last_sent = await self._replay(send, entitlement, last_event_id)
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            refresh_at = time.monotonic() + ENTITLEMENT_REFRESH_INTERVAL
+            while not disconnected.done():
+                if expires_at is not None and time.time() >= expires_at:
+                    break # Token expirou: o cliente reconecta com um token novo
+                if time.monotonic() >= refresh_at:
+                    entitlement, _ = await sync_to_async(_entitlement_for_token)(raw_token)
+                    if entitlement is None: # Usuário desativado/removido
+                        break
+                    refresh_at = time.monotonic() + ENTITLEMENT_REFRESH_INTERVAL
+
+                timeout = HEARTBEAT_INTERVAL
+                if expires_at is not None:
+                    timeout = max(min(timeout, expires_at - time.time()), 0)
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    {getter, disconnected}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter not in done:
+                    getter.cancel()
+                    if not disconnected.done():
+                        await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                    continue
+
+                raw = getter.result()
+                if raw is None: # Conexão lenta demais
+                    break
+                message = json.loads(raw)
+                if last_sent and _stream_id_key(message['id']) <= last_sent:
+                    continue # Já enviado no replay
+                if should_deliver(entitlement, json.loads(message['data'])):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': format_sse(message['id'], message['data']),
+                        'more_body': True,
+                    })
+        except OSError: # Cliente desconectou durante o envio
+            pass
+        finally:
+            broadcaster.unsubscribe(queue)
+            disconnected.cancel()
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b''})
+
+    async def _replay(self, send, entitlement, last_event_id):
+        """
+        Reenvia os eventos posteriores a `last_event_id`. Retorna a chave do último id enviado.
+        """
+        if not last_event_id:
+            return None
+        try:
+            last_sent = _stream_id_key(last_event_id)
+            history = await broadcaster.client.xrange(
+                EVENTS_STREAM_KEY, min=f"({last_event_id}", count=REPLAY_LIMIT
+            )
+        except (ValueError, redis.RedisError):
+            logger.warning("Não foi possível retomar a partir de %s.", last_event_id, exc_info=True)
+            return None
+
+        for event_id, fields in history:
+            if should_deliver(entitlement, json.loads(fields['data'])):
+                await send({
+                    'type': 'http.response.body',
+                    'body': format_sse(event_id, fields['data']),
+                    'more_body': True,
+                })
+            last_sent = _stream_id_key(event_id)
+        return last_sent
+
+    async def _wait_disconnect(self, receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    async def _reply(self, send, status, detail):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json')],
+        })
+        await send({'type': 'http.response.body', 'body': json.dumps({'detail': detail}).encode()})
@@ -0,0 +1,114 @@
+"""
+Sincronização incremental (delta sync) das notícias.
+
+O cliente guarda um token opaco e pede só o que mudou desde ele: notícias com
+`updated_at` posterior ao cursor (visíveis para o usuário) e ids que deixaram
+de ser visíveis (tombstones). Os dois cursores vão no mesmo token, junto com
+o instante até onde a resposta que o emitiu estava completa: é ele que decide
+a expiração (tombstones mais antigos que a retenção já podem ter sido
+apagados), não o `updated_at` do cursor, que numa sincronização completa
+aponta para notícias antigas.
+
+Linhas mais recentes que `SYNC_SAFETY_LAG` ainda não são entregues: uma
+transação que commita atrasada pode gravar um `updated_at` (ou um id de
+tombstone) menor que o de linhas já entregues, e seria pulada pelo cursor.
+"""
+import base64
+import json
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import NewsTombstone
+
+SYNC_SAFETY_LAG = timedelta(seconds=5)
+# Tombstones mais antigos que isso são apagados; tokens anteriores exigem sincronização completa
+TOMBSTONE_RETENTION = timedelta(days=30)
+SYNC_PAGE_SIZE = 100
+SYNC_MAX_PAGE_SIZE = 500
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+class ExpiredSyncToken(Exception):
+    pass
+
+
+def encode_token(updated_at, news_id, tombstone_id, synced_at):
+    payload = {
+        'u': updated_at.isoformat() if updated_at else None,
+        'i': news_id,
+        't': tombstone_id,
+        'a': synced_at.isoformat(),
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+
+def decode_token(token):
+    """
+    Retorna (updated_at, news_id, tombstone_id). Token vazio = desde o início.
+    """
+    if not token:
+        return None, 0, 0
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        updated_at = parse_datetime(payload['u']) if payload['u'] else None
+        cursor = (updated_at, int(payload['i']), int(payload['t']))
+        # Tokens emitidos antes do campo 'a' expiram pelo cursor, como antes
+        synced_at = parse_datetime(payload['a']) if payload.get('a') else updated_at
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidSyncToken("Token de sincronização inválido.") from e
+    if synced_at and synced_at < timezone.now() - TOMBSTONE_RETENTION:
+        raise ExpiredSyncToken("Token de sincronização expirado; refaça a sincronização completa.")
+    return cursor
+
+
+def changes_since(visible_news, token, limit=SYNC_PAGE_SIZE):
+    """
+    Calcula uma página de mudanças a partir de `token`.
+
+    `visible_news` é o queryset de notícias visíveis para o usuário. Retorna
+    (notícias alteradas, ids removidos, próximo token, has_more).
+    """
+    updated_at, last_news_id, last_tombstone_id = decode_token(token)
+    horizon = timezone.now() - SYNC_SAFETY_LAG
+
+    changed = visible_news.filter(updated_at__lte=horizon)
+    if updated_at:
+        changed = changed.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=last_news_id))
+    changed = list(
+        changed.select_related('author').prefetch_related('verticals').order_by('updated_at', 'id')[:limit + 1]
+    )
+
+    tombstones = list(
+        NewsTombstone.objects.filter(id__gt=last_tombstone_id, created_at__lte=horizon)
+        .order_by('id').values_list('id', 'news_id')[:limit + 1]
+    )
+
+    has_more = len(changed) > limit or len(tombstones) > limit
+    changed, tombstones = changed[:limit], tombstones[:limit]
+
+    # Só avisa a remoção se a notícia continua invisível para o usuário
+    # (ex.: foi despublicada e republicada depois: aparece em `changed`)
+    candidate_ids = {news_id for _, news_id in tombstones}
+    still_visible = set(visible_news.filter(id__in=candidate_ids).values_list('id', flat=True))
+    removed = sorted(candidate_ids - still_visible)
+
+    if changed:
+        updated_at, last_news_id = changed[-1].updated_at, changed[-1].id
+    else:
+        # Nada mudou até o horizonte: o cursor avança até ele (e o token não expira à toa)
+        updated_at, last_news_id = horizon, 0
+    if tombstones:
+        last_tombstone_id = tombstones[-1][0]
+    return changed, removed, encode_token(updated_at, last_news_id, last_tombstone_id, horizon), has_more
+
+
+def purge_tombstones():
+    cutoff = timezone.now() - TOMBSTONE_RETENTION
+    deleted, _ = NewsTombstone.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
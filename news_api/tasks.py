@@ -1,9 +1,51 @@
 import time
-from celery import shared_task
-from django.core.mail import send_mail
+from celery import Task, shared_task
+from django.core.cache import cache
+from django.core.mail import send_mail, send_mass_mail
 from django.conf import settings
 
-@shared_task # Usa o app Celery configurado no projeto
+
+class DedupeTask(Task):
+    """
+    Task idempotente: execuções com a mesma `dedupe_key` só rodam uma vez.
+
+    Duas chaves no cache compartilhado (Redis):
+    - uma reserva curta ("em execução", `CELERY_TASK_DEDUPE_LEASE`), que impede
+      duas execuções simultâneas da mesma mensagem duplicada;
+    - a marca "concluída" (`CELERY_TASK_DEDUPE_TTL`), gravada só depois que a
+      task termina com sucesso.
+    Se o worker morrer no meio da execução, a reserva expira sozinha e a
+    mensagem reentregue pelo broker (acks_late) executa normalmente. Se a task
+    falhar, a reserva é liberada para permitir uma nova tentativa.
+    """
+    def __call__(self, *args, dedupe_key=None, **kwargs):
+        if dedupe_key is None:
+            return super().__call__(*args, **kwargs)
+
+        done_key = f"celery:dedupe:{self.name}:{dedupe_key}"
+        lease_key = f"{done_key}:running"
+        if cache.get(done_key):
+            print(f"Task {self.name} com dedupe_key '{dedupe_key}' já executada; ignorando.")
+            return None
+        if not cache.add(lease_key, True, settings.CELERY_TASK_DEDUPE_LEASE):
+            # Outra cópia está rodando: tenta de novo depois que ela terminar (ou a reserva expirar)
+            raise self.retry(countdown=settings.CELERY_TASK_DEDUPE_LEASE, max_retries=None)
+        if cache.get(done_key):
+            # Outra cópia concluiu e liberou a reserva entre a primeira checagem e o add
+            cache.delete(lease_key)
+            print(f"Task {self.name} com dedupe_key '{dedupe_key}' já executada; ignorando.")
+            return None
+        try:
+            result = super().__call__(*args, **kwargs)
+        except Exception:
+            cache.delete(lease_key)
+            raise
+        cache.set(done_key, True, settings.CELERY_TASK_DEDUPE_TTL)
+        cache.delete(lease_key)
+        return result
+
+
+@shared_task(base=DedupeTask) # Usa o app Celery configurado no projeto
 def send_notification_email_task(recipient_email, subject, message):
     """
     Task assíncrona para enviar um e-mail de notificação.
@@ -31,4 +73,124 @@ def send_notification_email_task(recipient_email, subject, message):
 
     # Simulação simples sem envio real:
     print(f"Simulação: E-mail enviado para {recipient_email} com assunto '{subject}'")
-    return f"Simulated success: Email task for {recipient_email} completed."
\ No newline at end of file
+    return f"Simulated success: Email task for {recipient_email} completed."
+
+
+@shared_task(base=DedupeTask)
+def send_notification_email_batch_task(messages):
+    """
+    Envia vários e-mails de notificação em uma única task (e uma única conexão SMTP).
+
+    `messages` é uma lista de [recipient_email, subject, message].
+    """
+    datatuple = [
+        (subject, message, settings.DEFAULT_FROM_EMAIL, [recipient_email])
+        for recipient_email, subject, message in messages
+    ]
+    sent = send_mass_mail(datatuple, fail_silently=False)
+    print(f"Lote de notificações enviado: {sent} de {len(datatuple)} e-mails.")
+    return sent
+
+
+def dispatch_notification_emails(messages, batch_size=100, dedupe_prefix=None):
+    """
+    Agrupa muitas notificações pequenas em tasks de lote.
+
+    Em vez de publicar uma task por e-mail, publica uma task a cada `batch_size`
+    mensagens. Se `dedupe_prefix` for informado, cada lote recebe uma chave de
+    deduplicação estável (`<prefix>:<índice do lote>`), então republicar o mesmo
+    conjunto de mensagens não reenvia os e-mails.
+    """
+    messages = [list(m) for m in messages]
+    for index, start in enumerate(range(0, len(messages), batch_size)):
+        batch = messages[start:start + batch_size]
+        dedupe_key = f"{dedupe_prefix}:{index}" if dedupe_prefix else None
+        send_notification_email_batch_task.apply_async(
+            args=[batch], kwargs={'dedupe_key': dedupe_key}
+        )
+
+
+@shared_task(base=DedupeTask)
+def send_notification_news_published_task(events):
+    """
+    Publica no stream SSE os eventos de notícias recém-publicadas.
+    """
+    from .streams import publish_news_events
+    publish_news_events(events)
+
+
+@shared_task
+def flush_news_counters_task():
+    """
+    Grava em lote, no banco, os contadores de leitura acumulados no Redis.
+    """
+    from .counters import flush_news_counters
+    updated = flush_news_counters()
+    print(f"Contadores de leitura gravados para {updated} notícias.")
+
+
+@shared_task
+def refresh_most_read_task():
+    """
+    Recalcula os rankings "mais lidas" pré-computados no Redis.
+    """
+    from .counters import refresh_most_read
+    refresh_most_read()
+
+
+@shared_task
+def update_related_news_task(news_ids):
+    """
+    Calcula (incrementalmente) as notícias relacionadas das notícias informadas.
+    """
+    from .related import update_related_news
+    updated = update_related_news(news_ids)
+    print(f"Relacionadas calculadas para {updated} notícias.")
+
+
+@shared_task
+def refresh_related_news_task():
+    """
+    Calcula, em lote, as relacionadas das notícias publicadas/alteradas desde a
+    execução anterior e das recentes que ainda não as têm.
+    """
+    from .related import refresh_related_news
+    updated = refresh_related_news()
+    print(f"Relacionadas calculadas para {updated} notícias.")
+
+
+@shared_task
+def refresh_archive_counts_task(months):
+    """
+    Recalcula as contagens do arquivo dos meses informados ([[ano, mês], ...]).
+    """
+    from .archive import refresh_archive_counts
+    refresh_archive_counts(months)
+
+
+@shared_task
+def purge_news_tombstones_task():
+    """
+    Remove tombstones mais antigos que o período de retenção da sincronização.
+    """
+    from .sync import purge_tombstones
+    purged = purge_tombstones()
+    print(f"{purged} tombstones removidos.")
+
+
+@shared_task(base=DedupeTask)
+def apply_news_count_deltas_task(deltas):
+    """
+    Aplica às contagens das listagens de notícias os deltas de um evento do ciclo de vida.
+    """
+    from .news_counts import apply_count_deltas
+    apply_count_deltas(deltas)
+
+
+@shared_task
+def reconcile_news_counts_task():
+    """
+    Recalcula do banco as contagens das listagens de notícias (corrige desvios dos incrementos).
+    """
+    from .news_counts import reconcile_news_counts
+    reconcile_news_counts()
@@ -1,7 +1,7 @@
 import pytest
 from django.utils.text import slugify
 from django.urls import reverse
-from .models import Vertical
+from .models import User, Vertical
 from rest_framework import status
 from rest_framework.test import APIClient
 
@@ -51,3 +51,878 @@ def test_list_verticals_api_anonymous():
     assert vertical1.name in vertical_names_in_response
     assert vertical2.name in vertical_names_in_response
 
+def test_notification_task_dedupe_key_runs_once(mocker):
+    """
+    Testa se a mesma dedupe_key não executa a task de notificação duas vezes.
+    """
+    from django.core.cache import cache
+    from .tasks import send_notification_email_task
+
+    mocker.patch('news_api.tasks.time.sleep')
+    cache.delete(f"celery:dedupe:{send_notification_email_task.name}:news-1")
+
+    first = send_notification_email_task("admin@jota.info", "Assunto", "Mensagem", dedupe_key="news-1")
+    second = send_notification_email_task("admin@jota.info", "Assunto", "Mensagem", dedupe_key="news-1")
+
+    assert first is not None
+    assert second is None
+
+def test_dispatch_notification_emails_batches_messages(mocker):
+    """
+    Testa se várias notificações são agrupadas em tasks de lote.
+    """
+    from .tasks import dispatch_notification_emails, send_notification_email_batch_task
+
+    apply_async = mocker.patch.object(send_notification_email_batch_task, 'apply_async')
+    messages = [(f"leitor{i}@jota.info", "Assunto", "Mensagem") for i in range(5)]
+
+    dispatch_notification_emails(messages, batch_size=2, dedupe_prefix="digest")
+
+    assert apply_async.call_count == 3
+    batch_sizes = [len(call.kwargs['args'][0]) for call in apply_async.call_args_list]
+    assert batch_sizes == [2, 2, 1]
+    assert apply_async.call_args_list[0].kwargs['kwargs'] == {'dedupe_key': 'digest:0'}
+
+@pytest.mark.django_db
+def test_create_published_news_writes_outbox_instead_of_broker(mocker):
+    """
+    Testa se criar uma notícia publicada grava a task na outbox sem falar com o broker.
+    """
+    from .models import News, OutboxMessage, User
+    from .tasks import send_notification_email_task
+
+    delay = mocker.patch.object(send_notification_email_task, 'delay')
+    apply_async = mocker.patch.object(send_notification_email_task, 'apply_async')
+    editor = User.objects.create_user(username="editor", password="senha123", role=User.Role.EDITOR)
+    vertical = Vertical.objects.create(name="Poder")
+
+    client = APIClient()
+    client.force_authenticate(user=editor)
+    response = client.post(reverse('news-list'), {
+        'title': "Notícia", 'content': "Conteúdo", 'status': News.Status.PUBLISHED,
+        'vertical_ids': [vertical.id],
+    }, format='json')
+
+    assert response.status_code == status.HTTP_201_CREATED
+    delay.assert_not_called()
+    apply_async.assert_not_called()
+    message = OutboxMessage.objects.get(task_name=send_notification_email_task.name)
+    assert message.kwargs == {'dedupe_key': f"news-published:{response.json()['id']}"}
+    assert message.dispatched_at is None
+
+@pytest.mark.django_db
+def test_relay_outbox_dispatches_pending_messages(mocker):
+    """
+    Testa se o relay publica as mensagens pendentes e as marca como despachadas.
+    """
+    from jota_project.celery import app
+    from .models import OutboxMessage
+    from .outbox import enqueue_task, relay_outbox
+
+    send_task = mocker.patch.object(app, 'send_task')
+    enqueue_task('news_api.tasks.send_notification_email_task', args=["a@jota.info", "S", "M"])
+    enqueue_task('news_api.tasks.send_notification_email_task', args=["b@jota.info", "S", "M"])
+
+    assert relay_outbox(batch_size=10) == 2
+    assert send_task.call_count == 2
+    assert not OutboxMessage.objects.filter(dispatched_at__isnull=True).exists()
+    assert relay_outbox(batch_size=10) == 0
+
+@pytest.mark.django_db
+def test_news_views_are_buffered_in_redis_and_flushed_in_batch():
+    """
+    Testa se as leituras vão para o Redis e só chegam ao banco no flush.
+    """
+    from .counters import PENDING_VIEWS_KEY, DIRTY_READERS_KEY, flush_news_counters
+    from .models import News, NewsStats
+    from .redis_client import get_redis_connection
+
+    conn = get_redis_connection()
+    conn.delete(PENDING_VIEWS_KEY, DIRTY_READERS_KEY, f"{PENDING_VIEWS_KEY}:flushing", f"{DIRTY_READERS_KEY}:flushing")
+    news = News.objects.create(title="Lida", content="Conteúdo", status=News.Status.PUBLISHED)
+    url = reverse('news-detail', args=[news.id])
+
+    client = APIClient()
+    for _ in range(3):
+        assert client.get(url).status_code == status.HTTP_200_OK
+    assert not NewsStats.objects.filter(news=news).exists()
+
+    flush_news_counters()
+
+    stats = NewsStats.objects.get(news=news)
+    assert stats.view_count == 3
+    assert stats.unique_readers == 1
+
+@pytest.mark.django_db
+def test_retried_flush_does_not_count_views_twice(mocker):
+    """
+    Testa se um flush que gravou no banco mas falhou antes de limpar o Redis não soma o lote de novo.
+    """
+    import redis
+    from .counters import PENDING_VIEWS_KEY, DIRTY_READERS_KEY, flush_news_counters, record_news_view
+    from .models import News, NewsStats
+    from .redis_client import get_redis_connection
+
+    conn = get_redis_connection()
+    conn.delete(PENDING_VIEWS_KEY, DIRTY_READERS_KEY, f"{PENDING_VIEWS_KEY}:flushing", f"{DIRTY_READERS_KEY}:flushing")
+    news = News.objects.create(title="Lida", content="Conteúdo", status=News.Status.PUBLISHED)
+    for _ in range(2):
+        record_news_view(news.id, "ip:1")
+
+    mocker.patch.object(type(conn), 'delete', side_effect=redis.ConnectionError)
+    with pytest.raises(redis.ConnectionError):
+        flush_news_counters()
+    mocker.stopall()
+    assert NewsStats.objects.get(news=news).view_count == 2
+
+    record_news_view(news.id, "ip:2") # Chega depois: fica para o próximo lote
+    flush_news_counters() # Retoma o lote interrompido
+    assert NewsStats.objects.get(news=news).view_count == 2
+    flush_news_counters()
+    assert NewsStats.objects.get(news=news).view_count == 3
+
+@pytest.mark.django_db
+def test_most_read_endpoint_serves_precomputed_ranking():
+    """
+    Testa se /api/news/most-read/ ordena pelo ranking e respeita a visibilidade do usuário.
+    """
+    from .counters import record_news_view, refresh_most_read
+    from .models import News
+    from .redis_client import get_redis_connection
+
+    conn = get_redis_connection()
+    stale_keys = conn.keys('news:views:hour:*')
+    if stale_keys:
+        conn.delete(*stale_keys)
+    vertical = Vertical.objects.create(name="Tributos")
+    popular = News.objects.create(title="Popular", content="C", status=News.Status.PUBLISHED)
+    other = News.objects.create(title="Outra", content="C", status=News.Status.PUBLISHED)
+    pro = News.objects.create(title="PRO", content="C", status=News.Status.PUBLISHED, is_pro=True)
+    for news in (popular, other, pro):
+        news.verticals.add(vertical)
+    for i in range(5):
+        record_news_view(popular.id, f"ip:{i}")
+        record_news_view(pro.id, f"ip:{i}")
+    record_news_view(other.id, "ip:0")
+    refresh_most_read()
+
+    response = APIClient().get(reverse('news-most-read'), {'vertical': vertical.slug, 'window': '1h'})
+
+    assert response.status_code == status.HTTP_200_OK
+    ids = [item['id'] for item in response.json()]
+    assert ids[:2] == [popular.id, other.id]
+    assert pro.id not in ids # Anônimo não vê notícia PRO
+
+def test_most_read_endpoint_rejects_unknown_window():
+    """
+    Testa se uma janela desconhecida é rejeitada com 400.
+    """
+    response = APIClient().get(reverse('news-most-read'), {'window': '7d'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_tfidf_top_k_prefers_similar_text_and_shared_verticals():
+    """
+    Testa se a similaridade TF-IDF + verticais encontra a notícia mais parecida.
+    """
+    from .related import build_tfidf_matrix, build_vertical_matrix, news_tokens, top_k_similar
+
+    documents = [
+        news_tokens("Reforma tributária avança", "", "Congresso aprova reforma tributária do consumo"),
+        news_tokens("Reforma tributária: próximos passos", "", "Regulamentação da reforma tributária"),
+        news_tokens("Vacinação infantil", "", "Campanha de vacinação começa nos postos de saúde"),
+    ]
+    verticals = [{1}, {1}, {2}]
+
+    neighbors = top_k_similar(build_tfidf_matrix(documents), build_vertical_matrix(verticals), [0], k=2)
+
+    assert neighbors[0][0][0] == 1
+    assert all(col != 0 for col, _ in neighbors[0])
+
+@pytest.mark.django_db
+def test_related_endpoint_is_filtered_by_entitlement():
+    """
+    Testa se /api/news/{id}/related/ usa as relacionadas pré-calculadas e esconde PRO de anônimos.
+    """
+    from .models import News
+    from .related import update_related_news
+
+    vertical = Vertical.objects.create(name="Tributos")
+    base = News.objects.create(title="Reforma tributária avança", content="Reforma tributária no Congresso", status=News.Status.PUBLISHED)
+    open_news = News.objects.create(title="Reforma tributária: bastidores", content="Reforma tributária e o Senado", status=News.Status.PUBLISHED)
+    pro_news = News.objects.create(title="Reforma tributária PRO", content="Análise da reforma tributária", status=News.Status.PUBLISHED, is_pro=True)
+    for news in (base, open_news, pro_news):
+        news.verticals.add(vertical)
+
+    update_related_news([base.id, open_news.id, pro_news.id])
+    response = APIClient().get(reverse('news-related', args=[base.id]))
+
+    assert response.status_code == status.HTTP_200_OK
+    ids = [item['id'] for item in response.json()]
+    assert ids == [open_news.id]
+
+@pytest.mark.django_db
+def test_related_news_are_recomputed_in_one_periodic_batch(mocker):
+    """
+    Testa se edições não disparam o cálculo das relacionadas e a task periódica calcula todas de uma vez.
+    """
+    import json
+    from datetime import timedelta
+    from django.utils import timezone
+    from . import related
+    from .models import News, OutboxMessage, User
+    from .redis_client import get_redis_connection
+    from .tasks import refresh_related_news_task
+
+    mocker.patch.object(related, 'REFRESH_SAFETY_LAG', timedelta(0))
+    editor = User.objects.create_user(username="editor", password="senha123", role=User.Role.EDITOR)
+    first = News.objects.create(title="Reforma tributária avança", content="Reforma no Congresso", status=News.Status.PUBLISHED, author=editor)
+    second = News.objects.create(title="Reforma tributária: bastidores", content="Reforma no Senado", status=News.Status.PUBLISHED, author=editor)
+    related.update_related_news([first.id, second.id])
+    get_redis_connection().set(related.RELATED_WATERMARK_KEY, json.dumps({'u': (timezone.now() - timedelta(minutes=1)).isoformat(), 'i': None}))
+
+    client = APIClient()
+    client.force_authenticate(user=editor)
+    for news in (first, second):
+        response = client.patch(reverse('news-detail', args=[news.id]), {'content': "Reforma tributária revista"}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+    assert not OutboxMessage.objects.filter(task_name__contains='related').exists()
+
+    spy = mocker.spy(related, 'update_related_news')
+    refresh_related_news_task.apply()
+    spy.assert_called_once()
+    assert sorted(spy.call_args.args[0]) == sorted([first.id, second.id])
+
+    spy.reset_mock()
+    refresh_related_news_task.apply()
+    spy.assert_not_called()
+
+@pytest.mark.django_db
+def test_related_refresh_cursor_moves_past_a_batch_with_the_same_updated_at(mocker):
+    """
+    Testa se um lote cheio de notícias com o mesmo updated_at (ex.: publicação em lote) não trava o cursor.
+    """
+    import json
+    from datetime import timedelta
+    from django.utils import timezone
+    from . import related
+    from .models import News
+    from .redis_client import get_redis_connection
+
+    mocker.patch.object(related, 'REFRESH_SAFETY_LAG', timedelta(0))
+    mocker.patch.object(related, 'REFRESH_BATCH_SIZE', 2)
+    update = mocker.patch.object(related, 'update_related_news', return_value=0)
+    mocker.patch.object(related, 'news_missing_related', return_value=[])
+    ids = [News.objects.create(title=f"Notícia {i}", content="C", status=News.Status.PUBLISHED).id for i in range(5)]
+    same_instant = timezone.now() - timedelta(seconds=30)
+    News.objects.filter(id__in=ids).update(updated_at=same_instant)
+    get_redis_connection().set(related.RELATED_WATERMARK_KEY, json.dumps({'u': (same_instant - timedelta(minutes=1)).isoformat(), 'i': None}))
+
+    batches = []
+    for _ in range(4):
+        related.refresh_related_news()
+        batches.append(update.call_args.args[0] if update.called else [])
+        update.reset_mock()
+    assert batches == [ids[:2], ids[2:4], ids[4:], []]
+
+@pytest.mark.django_db
+def test_archive_counts_follow_publication_changes():
+    """
+    Testa se as contagens do arquivo acompanham publicação e despublicação.
+    """
+    from .archive import archive_month_count, refresh_archive_counts
+    from .entitlements import Entitlement
+    from .models import News, OutboxMessage, User
+    from .tasks import refresh_archive_counts_task
+
+    editor = User.objects.create_user(username="editor", password="senha123", role=User.Role.EDITOR)
+    vertical = Vertical.objects.create(name="Poder")
+    client = APIClient()
+    client.force_authenticate(user=editor)
+    response = client.post(reverse('news-list'), {
+        'title': "Notícia", 'content': "Conteúdo", 'status': News.Status.PUBLISHED,
+        'vertical_ids': [vertical.id],
+    }, format='json')
+    news = News.objects.get(id=response.json()['id'])
+    year, month = news.publication_date.year, news.publication_date.month
+
+    message = OutboxMessage.objects.get(task_name=refresh_archive_counts_task.name)
+    assert message.args == [[[year, month]]]
+    refresh_archive_counts(*message.args)
+    assert archive_month_count(Entitlement(), year, month) == 1
+    assert archive_month_count(Entitlement(), year, month, vertical.id) == 1
+
+    client.patch(reverse('news-detail', args=[news.id]), {'status': News.Status.DRAFT}, format='json')
+    refresh_archive_counts([[year, month]])
+    assert archive_month_count(Entitlement(), year, month) == 0
+
+@pytest.mark.django_db
+def test_archive_month_endpoint_uses_precomputed_count():
+    """
+    Testa se /api/news/archive/{ano}/{mês}/ pagina com o total pré-calculado.
+    """
+    from django.utils import timezone
+    from .archive import refresh_archive_counts
+    from .models import News
+
+    published = timezone.now().replace(day=15)
+    News.objects.create(title="Aberta", content="C", status=News.Status.PUBLISHED, publication_date=published)
+    News.objects.create(title="PRO", content="C", status=News.Status.PUBLISHED, publication_date=published, is_pro=True)
+    refresh_archive_counts([[published.year, published.month]])
+
+    client = APIClient()
+    response = client.get(reverse('news-archive-month', args=[published.year, published.month]))
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['count'] == 1
+    assert [item['title'] for item in response.json()['results']] == ["Aberta"]
+
+    months = client.get(reverse('news-archive')).json()
+    assert months == [{'year': published.year, 'month': published.month, 'count': 1}]
+
+@pytest.mark.django_db
+def test_archive_month_pages_are_not_cut_by_a_stale_count(mocker):
+    """
+    Testa se uma contagem do arquivo atrasada (abaixo do real) não esconde notícias nem a próxima página.
+    """
+    from django.utils import timezone
+    from .archive import refresh_archive_counts
+    from .models import News
+    from .pagination import PrecomputedCountPagination
+
+    mocker.patch.object(PrecomputedCountPagination, 'page_size', 2)
+    published = timezone.now().replace(day=15)
+    News.objects.create(title="Primeira", content="C", status=News.Status.PUBLISHED, publication_date=published)
+    refresh_archive_counts([[published.year, published.month]])
+    for title in ("Segunda", "Terceira"):
+        News.objects.create(title=title, content="C", status=News.Status.PUBLISHED, publication_date=published)
+
+    client = APIClient()
+    url = reverse('news-archive-month', args=[published.year, published.month])
+    first_page = client.get(url).json()
+    assert len(first_page['results']) == 2
+    assert first_page['count'] == 3
+    assert first_page['next'] is not None
+
+    last_page = client.get(first_page['next']).json()
+    assert len(last_page['results']) == 1
+    assert last_page['count'] == 3
+    assert last_page['next'] is None
+    assert client.get(url, {'page': 3}).status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+def test_changes_endpoint_returns_only_deltas_and_removals(mocker):
+    """
+    Testa se /api/news/changes/ devolve só o que mudou desde o token e as remoções.
+    """
+    from datetime import timedelta
+    from .models import News
+
+    mocker.patch('news_api.sync.SYNC_SAFETY_LAG', timedelta(0))
+    admin = User.objects.create_user(username="admin", password="senha123", role=User.Role.ADMIN, is_staff=True)
+    first = News.objects.create(title="Primeira", content="C", status=News.Status.PUBLISHED)
+    second = News.objects.create(title="Segunda", content="C", status=News.Status.PUBLISHED)
+    url = reverse('news-changes')
+    reader = APIClient()
+
+    initial = reader.get(url).json()
+    assert {item['id'] for item in initial['changed']} == {first.id, second.id}
+    assert initial['removed'] == []
+
+    editor_client = APIClient()
+    editor_client.force_authenticate(user=admin)
+    editor_client.patch(reverse('news-detail', args=[first.id]), {'title': "Primeira (editada)"}, format='json')
+    editor_client.delete(reverse('news-detail', args=[second.id]))
+
+    delta = reader.get(url, {'since': initial['next']}).json()
+    assert [item['title'] for item in delta['changed']] == ["Primeira (editada)"]
+    assert delta['removed'] == [second.id]
+
+    empty = reader.get(url, {'since': delta['next']}).json()
+    assert empty['changed'] == [] and empty['removed'] == []
+
+@pytest.mark.django_db
+def test_changes_full_sync_pages_through_old_news(mocker):
+    """
+    Testa se a sincronização completa pagina notícias editadas antes da retenção dos tombstones
+    e se só um token parado há mais que a retenção expira.
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+    from .models import News
+    from .sync import TOMBSTONE_RETENTION, decode_token, encode_token
+
+    mocker.patch('news_api.sync.SYNC_SAFETY_LAG', timedelta(0))
+    old = timezone.now() - TOMBSTONE_RETENTION * 2
+    ids = [News.objects.create(title=f"Antiga {i}", content="C", status=News.Status.PUBLISHED).id for i in range(3)]
+    News.objects.filter(id__in=ids).update(updated_at=old)
+    url = reverse('news-changes')
+    client = APIClient()
+
+    seen, token = [], None
+    for _ in range(3):
+        response = client.get(url, {'limit': 1, **({'since': token} if token else {})})
+        assert response.status_code == status.HTTP_200_OK
+        seen += [item['id'] for item in response.json()['changed']]
+        token = response.json()['next']
+    assert sorted(seen) == sorted(ids)
+
+    updated_at, news_id, tombstone_id = decode_token(token)
+    stale = encode_token(updated_at, news_id, tombstone_id, timezone.now() - TOMBSTONE_RETENTION - timedelta(days=1))
+    assert client.get(url, {'since': stale}).status_code == status.HTTP_410_GONE
+
+@pytest.mark.django_db
+def test_changes_endpoint_rejects_invalid_token():
+    """
+    Testa se um token malformado é rejeitado com 400.
+    """
+    response = APIClient().get(reverse('news-changes'), {'since': 'nao-e-um-token'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.django_db
+def test_promoted_scheduled_news_enqueues_published_event():
+    """
+    Testa se a promoção de uma notícia agendada gera o evento "published" para o stream SSE.
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+    from .lifecycle import promote_due_scheduled_news
+    from .models import News, OutboxMessage
+    from .tasks import send_notification_news_published_task
+
+    vertical = Vertical.objects.create(name="Saúde")
+    news = News.objects.create(
+        title="Agendada", content="C", status=News.Status.SCHEDULED, is_pro=True,
+        scheduled_publish_date=timezone.now() - timedelta(minutes=1),
+    )
+    news.verticals.add(vertical)
+
+    assert promote_due_scheduled_news() == [news.id]
+
+    message = OutboxMessage.objects.get(task_name=send_notification_news_published_task.name)
+    assert message.args == [[{'id': news.id, 'title': "Agendada", 'verticals': [vertical.id], 'is_pro': True}]]
+    assert message.kwargs['dedupe_key']
+
+def test_stream_events_are_filtered_by_entitlement():
+    """
+    Testa se eventos PRO só chegam a quem tem a vertical no plano.
+    """
+    from .entitlements import Entitlement
+    from .streams import should_deliver
+
+    event = {'id': 1, 'title': "PRO", 'verticals': [3], 'is_pro': True}
+    assert not should_deliver(Entitlement(), event)
+    assert not should_deliver(Entitlement(pro_vertical_ids=frozenset({1})), event)
+    assert should_deliver(Entitlement(pro_vertical_ids=frozenset({3})), event)
+    assert should_deliver(Entitlement(sees_all=True), event)
+    assert should_deliver(Entitlement(), dict(event, is_pro=False))
+
+def test_stream_rechecks_entitlement_and_closes_when_token_expires(mocker):
+    """
+    Testa se uma conexão SSE aberta para de receber PRO após o rebaixamento do plano e é encerrada na expiração do token.
+    """
+    import asyncio
+    import json
+    import time
+    from . import streams
+    from .entitlements import Entitlement
+
+    pro_event = {'id': 1, 'title': "PRO", 'verticals': [3], 'is_pro': True}
+    expires_at = time.time() + 0.5
+    mocker.patch.object(streams, 'ENTITLEMENT_REFRESH_INTERVAL', 0)
+    # Na conexão o leitor tem a vertical 3 no plano; nas releituras, o plano já foi rebaixado
+    resolve = mocker.patch.object(streams, '_entitlement_for_token', side_effect=lambda token: (
+        Entitlement(pro_vertical_ids=frozenset({3})) if resolve.call_count == 1 else Entitlement(), expires_at
+    ))
+    sent = []
+
+    async def run():
+        queue = asyncio.Queue()
+        queue.put_nowait(json.dumps({'id': '1-0', 'data': json.dumps(pro_event)}))
+        mocker.patch.object(streams.broadcaster, 'subscribe', return_value=queue)
+        mocker.patch.object(streams.broadcaster, 'unsubscribe')
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'headers': [(b'authorization', b'Bearer jwt')], 'query_string': b''}
+        await asyncio.wait_for(streams.NewsStreamApp()(scope, receive, send), timeout=5)
+
+    asyncio.run(run())
+    bodies = b''.join(message.get('body', b'') for message in sent)
+    assert sent[0]['status'] == 200
+    assert b'event: published' not in bodies
+    assert sent[-1] == {'type': 'http.response.body', 'body': b''}
+    assert resolve.call_count >= 2
+
+@pytest.mark.django_db
+def test_admin_bulk_publish_and_unpublish_actions(client):
+    """
+    Testa as ações em lote do admin de notícias (publicar/despublicar) e seus efeitos derivados.
+    """
+    from .models import News, NewsTombstone, OutboxMessage
+    from .tasks import send_notification_news_published_task
+
+    admin_user = User.objects.create_superuser(username="root", password="senha123", email="root@jota.info")
+    drafts = [News.objects.create(title=f"Rascunho {i}", content="C") for i in range(3)]
+    client.force_login(admin_user)
+    url = reverse('admin:news_api_news_changelist')
+
+    response = client.post(url, {'action': 'publish_selected', '_selected_action': [n.id for n in drafts]})
+    assert response.status_code == 302
+    assert News.objects.filter(status=News.Status.PUBLISHED).count() == 3
+    assert OutboxMessage.objects.filter(task_name=send_notification_news_published_task.name).count() == 1
+
+    response = client.post(url, {'action': 'unpublish_selected', '_selected_action': [drafts[0].id]})
+    assert response.status_code == 302
+    assert News.objects.get(id=drafts[0].id).status == News.Status.DRAFT
+    assert NewsTombstone.objects.filter(news_id=drafts[0].id, reason=NewsTombstone.Reason.UNPUBLISHED).exists()
+
+@pytest.mark.django_db
+def test_admin_edits_and_deletes_go_through_lifecycle(client):
+    """
+    Testa se o formulário e a remoção em lote do admin geram tombstones, revisões e mensagens na outbox.
+    """
+    from django.utils import timezone
+    from .models import News, NewsRevision, NewsTombstone, OutboxMessage
+    from .tasks import apply_news_count_deltas_task
+
+    admin_user = User.objects.create_superuser(username="root", password="senha123", email="root@jota.info")
+    vertical = Vertical.objects.create(name="Poder")
+    edited = News.objects.create(title="Publicada", content="Texto", status=News.Status.PUBLISHED, author=admin_user)
+    edited.verticals.add(vertical)
+    removed = [News.objects.create(title=f"Removida {i}", content="C", status=News.Status.PUBLISHED) for i in range(2)]
+    client.force_login(admin_user)
+
+    published = timezone.localtime(edited.publication_date)
+    response = client.post(reverse('admin:news_api_news_change', args=[edited.id]), {
+        'title': "Publicada", 'subtitle': "", 'content': "Texto revisto", 'status': News.Status.DRAFT,
+        'publication_date_0': published.strftime('%Y-%m-%d'), 'publication_date_1': published.strftime('%H:%M:%S'),
+        'scheduled_publish_date_0': "", 'scheduled_publish_date_1': "",
+        'author': admin_user.id, 'verticals': [vertical.id],
+    })
+    assert response.status_code == 302
+    assert NewsTombstone.objects.filter(news_id=edited.id, reason=NewsTombstone.Reason.UNPUBLISHED).exists()
+    assert list(NewsRevision.objects.filter(news=edited).values_list('number', flat=True).order_by('number')) == [1, 2]
+    assert OutboxMessage.objects.filter(task_name=apply_news_count_deltas_task.name).count() == 1
+
+    response = client.post(reverse('admin:news_api_news_changelist'), {
+        'action': 'delete_selected', '_selected_action': [news.id for news in removed], 'post': 'yes',
+    })
+    assert response.status_code == 302
+    assert not News.objects.filter(id__in=[news.id for news in removed]).exists()
+    assert NewsTombstone.objects.filter(
+        news_id__in=[news.id for news in removed], reason=NewsTombstone.Reason.DELETED
+    ).count() == 2
+    assert OutboxMessage.objects.filter(task_name=apply_news_count_deltas_task.name).count() == 2
+
+@pytest.mark.django_db
+def test_admin_derived_tables_are_read_only(client):
+    """
+    Testa se revisões, outbox, tombstones e contagens do arquivo não podem ser criados, editados ou removidos pelo admin.
+    """
+    from .models import News, NewsRevision
+    from .revisions import record_revision, revision_document
+
+    news = News.objects.create(title="Notícia", content="Texto")
+    record_revision(news, revision_document(news))
+    revision = NewsRevision.objects.get(news=news)
+    client.force_login(User.objects.create_superuser(username="root", password="senha123", email="root@jota.info"))
+
+    for model in ('newsrevision', 'outboxmessage', 'newstombstone', 'newsarchivecount'):
+        assert client.get(reverse(f'admin:news_api_{model}_changelist')).status_code == 200
+        assert client.get(reverse(f'admin:news_api_{model}_add')).status_code == 403
+    assert client.post(reverse('admin:news_api_newsrevision_delete', args=[revision.id]), {'post': 'yes'}).status_code == 403
+    assert NewsRevision.objects.filter(id=revision.id).exists()
+
+@pytest.mark.django_db
+def test_admin_changelist_pages_past_a_low_estimate(client, mocker):
+    """
+    Testa se uma estimativa de total abaixo do real não corta as páginas do changelist.
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+    from .admin import NewsAdmin
+    from .models import News
+
+    mocker.patch('news_api.pagination.approximate_count', return_value=3)
+    mocker.patch.object(NewsAdmin, 'list_per_page', 2)
+    now = timezone.now()
+    for i in range(5):
+        News.objects.create(title=f"Notícia {i}", content="C", publication_date=now - timedelta(days=i))
+    client.force_login(User.objects.create_superuser(username="root", password="senha123", email="root@jota.info"))
+
+    response = client.get(reverse('admin:news_api_news_changelist'), {'p': 3})
+    assert response.status_code == 200
+    assert [news.title for news in response.context['cl'].result_list] == ["Notícia 4"]
+
+@pytest.mark.django_db
+def test_admin_changelists_render_and_reassign_plan(client):
+    """
+    Testa se os changelists do admin carregam e se a ação de troca de plano atualiza em lote.
+    """
+    from .models import Plan, UserPlan
+
+    admin_user = User.objects.create_superuser(username="root", password="senha123", email="root@jota.info")
+    info = Plan.objects.create(name="JOTA Info")
+    pro = Plan.objects.create(name="JOTA PRO", is_pro_plan=True)
+    readers = [User.objects.create_user(username=f"leitor{i}", password="senha123") for i in range(2)]
+    subscriptions = [UserPlan.objects.create(user=reader, plan=info) for reader in readers]
+    client.force_login(admin_user)
+
+    for model in ('user', 'news', 'userplan', 'plan', 'vertical', 'newsstats', 'outboxmessage'):
+        assert client.get(reverse(f'admin:news_api_{model}_changelist')).status_code == 200
+
+    response = client.post(reverse('admin:news_api_userplan_changelist'), {
+        'action': f'reassign_to_plan_{pro.id}', '_selected_action': [s.id for s in subscriptions],
+    })
+    assert response.status_code == 302
+    assert UserPlan.objects.filter(plan=pro).count() == 2
+
+def test_schema_is_built_once_and_served_with_etag_and_gzip(settings, tmp_path, mocker):
+    """
+    Testa se o schema OpenAPI é gerado uma vez (no build) e servido pronto, com ETag e gzip.
+    """
+    import gzip
+    from django.core.management import call_command
+    from . import schema
+
+    settings.OPENAPI_SCHEMA_DIR = str(tmp_path)
+    settings.APP_VERSION = 'teste-schema'
+    schema._documents.clear()
+    call_command('build_openapi_schema')
+    assert (tmp_path / 'openapi-teste-schema.json').exists()
+
+    generate = mocker.patch('news_api.schema.generate_schema')
+    client = APIClient()
+    response = client.get('/api/schema/?format=json', HTTP_ACCEPT_ENCODING='gzip')
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Encoding'] == 'gzip'
+    assert b'"/api/news/"' in gzip.decompress(response.content)
+    generate.assert_not_called()
+
+    cached = client.get('/api/schema/?format=json', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+
+    yaml_response = client.get('/api/schema/')
+    assert yaml_response['Content-Type'] == 'application/vnd.oai.openapi'
+    assert yaml_response['ETag'] != response['ETag']
+
+    for name in ('swagger-ui', 'redoc'):
+        page = client.get(reverse(name))
+        assert page.status_code == status.HTTP_200_OK
+        assert client.get(reverse(name), HTTP_IF_NONE_MATCH=page['ETag']).status_code == status.HTTP_304_NOT_MODIFIED
+    schema._documents.clear()
+
+@pytest.mark.django_db
+def test_user_directory_filters_and_embeds_plans_by_reference(django_assert_num_queries):
+    """
+    Testa o diretório de usuários: filtros, paginação por cursor e planos enviados uma vez por página.
+    """
+    from datetime import date
+    from .models import Plan, UserPlan
+
+    admin_user = User.objects.create_user(username="admin", password="senha123", role=User.Role.ADMIN, is_staff=True)
+    vertical = Vertical.objects.create(name="Tributos")
+    pro = Plan.objects.create(name="JOTA PRO", is_pro_plan=True)
+    pro.allowed_verticals.add(vertical)
+    info = Plan.objects.create(name="JOTA Info")
+    readers = [User.objects.create_user(username=f"leitor{i}", password="senha123") for i in range(5)]
+    for i, reader in enumerate(readers):
+        UserPlan.objects.create(user=reader, plan=pro if i < 3 else info, end_date=date(2030, 1, 1 + i))
+    User.objects.filter(id=readers[4].id).update(is_active=False)
+
+    client = APIClient()
+    client.force_authenticate(user=admin_user)
+    url = reverse('user-directory')
+
+    with django_assert_num_queries(3): # usuários da página, planos e verticais dos planos
+        response = client.get(url, {'role': User.Role.READER, 'page_size': 2})
+    assert response.status_code == status.HTTP_200_OK
+    assert [user['username'] for user in response.data['results']] == ["leitor0", "leitor1"]
+    assert response.data['results'][0]['plan'] == pro.id
+    assert list(response.data['plans']) == [str(pro.id)]
+    assert response.data['plans'][str(pro.id)]['allowed_verticals'][0]['slug'] == "tributos"
+
+    next_page = client.get(response.data['next'])
+    assert [user['username'] for user in next_page.data['results']] == ["leitor2", "leitor3"]
+    assert set(next_page.data['plans']) == {str(pro.id), str(info.id)}
+
+    response = client.get(url, {'plan': info.id, 'is_active': 'true'})
+    assert [user['username'] for user in response.data['results']] == ["leitor3"]
+    response = client.get(url, {'expires_before': '2030-01-03'})
+    assert [user['username'] for user in response.data['results']] == ["leitor0", "leitor1"]
+    assert client.get(url, {'role': 'CHEFE'}).status_code == status.HTTP_400_BAD_REQUEST
+
+def test_revision_deltas_rebuild_every_version():
+    """
+    Testa se os diffs por palavras e os snapshots periódicos reconstroem cada versão exatamente.
+    """
+    from .revisions import apply_delta, make_delta
+
+    versions = [
+        {'title': "T", 'subtitle': None, 'content': "Primeiro parágrafo.\n\nSegundo  parágrafo.", 'status': 'DRAFT', 'verticals': [1]},
+        {'title': "T", 'subtitle': "S", 'content': "Primeiro parágrafo, revisado.\n\nSegundo  parágrafo.", 'status': 'DRAFT', 'verticals': [1]},
+        {'title': "T2", 'subtitle': "S", 'content': "Novo começo. Primeiro parágrafo, revisado.\n\n", 'status': 'PUBLISHED', 'verticals': [1, 2]},
+    ]
+    for previous, document in zip(versions, versions[1:]):
+        delta = make_delta(previous, document)
+        assert 'content' not in delta
+        assert apply_delta(previous, delta) == document
+
+@pytest.mark.django_db
+def test_news_revisions_are_listed_and_restored(mocker):
+    """
+    Testa o histórico de revisões: uma revisão por edição, reconstrução e restauração via API.
+    """
+    from .models import News, NewsRevision
+    from . import revisions
+
+    mocker.patch.object(revisions, 'SNAPSHOT_INTERVAL', 3)
+    editor = User.objects.create_user(username="editora", password="senha123", role=User.Role.EDITOR)
+    vertical = Vertical.objects.create(name="Poder")
+    client = APIClient()
+    client.force_authenticate(user=editor)
+    original = " ".join(f"palavra{i * 7919 % 1000}" for i in range(300))
+
+    response = client.post(reverse('news-list'), {
+        'title': "Versão 1", 'content': original, 'status': News.Status.DRAFT, 'vertical_ids': [vertical.id],
+    })
+    news_id = response.data['id']
+    detail_url = reverse('news-detail', args=[news_id])
+    for i in range(2, 6):
+        client.patch(detail_url, {'title': f"Versão {i}", 'content': original + f" com ajuste {i}"})
+
+    stored = list(NewsRevision.objects.filter(news_id=news_id).order_by('number').values_list('number', 'is_snapshot'))
+    assert stored == [(1, True), (2, False), (3, False), (4, True), (5, False)]
+
+    response = client.get(reverse('news-revisions', args=[news_id]))
+    assert [revision['number'] for revision in response.data] == [5, 4, 3, 2, 1]
+    assert response.data[0]['changed_fields'] == ['title', 'content']
+
+    response = client.get(reverse('news-revision', args=[news_id, 3]))
+    assert response.data['document']['title'] == "Versão 3"
+    assert response.data['document']['content'].endswith("com ajuste 3")
+
+    response = client.post(reverse('news-restore-revision', args=[news_id, 1]))
+    assert response.status_code == status.HTTP_200_OK
+    news = News.objects.get(id=news_id)
+    assert news.title == "Versão 1" and news.content == original
+    assert NewsRevision.objects.filter(news_id=news_id).count() == 6
+
+    reader = User.objects.create_user(username="leitor", password="senha123")
+    client.force_authenticate(user=reader)
+    assert client.get(reverse('news-revisions', args=[news_id])).status_code == status.HTTP_404_NOT_FOUND # Rascunho
+
+@pytest.mark.django_db
+def test_news_list_total_comes_from_incremental_counts():
+    """
+    Testa se o total da listagem vem das contagens por classe de acesso, mantidas
+    pelos eventos do ciclo de vida e corrigidas pela reconciliação.
+    """
+    from .entitlements import Entitlement
+    from .lifecycle import publish_news, unpublish_news
+    from .models import News, OutboxMessage
+    from .news_counts import reconcile_news_counts, visible_news_count
+    from .redis_client import get_redis_connection
+    from .tasks import apply_news_count_deltas_task
+
+    get_redis_connection().delete('news:counts')
+    poder, saude = Vertical.objects.create(name="Poder"), Vertical.objects.create(name="Saúde")
+    open_news = [News.objects.create(title=f"Aberta {i}", content="C") for i in range(3)]
+    pro_news = News.objects.create(title="PRO", content="C", is_pro=True)
+    pro_news.verticals.add(poder, saude)
+    publish_news(News.objects.all())
+    assert visible_news_count(Entitlement()) is None # Sem reconciliação ainda
+
+    reconcile_news_counts() # Já inclui a publicação acima
+    last_message_id = OutboxMessage.objects.order_by('-id').values_list('id', flat=True).first()
+    assert visible_news_count(Entitlement()) == 3
+    assert visible_news_count(Entitlement(pro_vertical_ids=frozenset({poder.id, saude.id}))) == 4
+    assert visible_news_count(Entitlement(sees_all=True)) == 4
+
+    unpublish_news(News.objects.filter(id=open_news[0].id))
+    News.objects.create(title="Rascunho", content="C")
+    for message in OutboxMessage.objects.filter(
+        task_name=apply_news_count_deltas_task.name, id__gt=last_message_id
+    ).order_by('id'):
+        apply_news_count_deltas_task.apply(args=message.args, kwargs=message.kwargs)
+    assert visible_news_count(Entitlement()) == 2
+    assert visible_news_count(Entitlement(sees_all=True)) == 4 # Rascunhos criados fora da API: só na reconciliação
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        response = APIClient().get(reverse('news-list'), {'page': 1})
+    assert not any('COUNT(' in query['sql'].upper() for query in queries.captured_queries)
+    assert response.data['count'] == 2
+    assert len(response.data['results']) == 2
+
+    # Sem ?page= a listagem continua sendo a lista simples
+    response = APIClient().get(reverse('news-list'))
+    assert isinstance(response.json(), list)
+    assert len(response.json()) == 2
+
+@pytest.mark.django_db
+def test_news_list_is_not_cut_by_lagging_counts():
+    """
+    Testa se contagens atrasadas (deltas ainda na outbox) não escondem notícias da listagem paginada.
+    """
+    from .models import News
+    from .news_counts import reconcile_news_counts
+    from .redis_client import get_redis_connection
+
+    get_redis_connection().delete('news:counts')
+    editor = User.objects.create_user(username="editor", password="senha123", role=User.Role.EDITOR)
+    for i in range(3):
+        News.objects.create(title=f"Aberta {i}", content="C", status=News.Status.PUBLISHED)
+    reconcile_news_counts()
+
+    client = APIClient()
+    client.force_authenticate(user=editor)
+    response = client.post(reverse('news-list'), {
+        'title': "Quarta", 'content': "C", 'status': News.Status.PUBLISHED,
+        'vertical_ids': [Vertical.objects.create(name="Poder").id],
+    }, format='json')
+    assert response.status_code == status.HTTP_201_CREATED
+
+    response = APIClient().get(reverse('news-list'), {'page': 1})
+    assert response.data['count'] == 4
+    assert len(response.data['results']) == 4
+    assert response.data['next'] is None
+
+def test_dedupe_task_reruns_after_worker_lost(mocker):
+    """
+    Testa se uma task deduplicada interrompida (worker morto, só a reserva ficou) roda
+    de novo quando a reserva expira, e só é ignorada depois de concluída.
+    """
+    from django.core.cache import cache
+    from .tasks import send_notification_email_task
+
+    mocker.patch('news_api.tasks.time.sleep')
+    done_key = f"celery:dedupe:{send_notification_email_task.name}:news-2"
+    cache.delete(done_key)
+    # Worker morreu no meio da execução: a reserva expirou e nenhuma marca de conclusão foi gravada
+    cache.delete(f"{done_key}:running")
+
+    assert send_notification_email_task("admin@jota.info", "Assunto", "Mensagem", dedupe_key="news-2") is not None
+    assert cache.get(done_key)
+    assert cache.get(f"{done_key}:running") is None
+    assert send_notification_email_task("admin@jota.info", "Assunto", "Mensagem", dedupe_key="news-2") is None
+
+    # Cópia ainda em execução (reserva ativa): a duplicata é reagendada, não descartada
+    from celery.exceptions import Retry
+    cache.delete(f"celery:dedupe:{send_notification_email_task.name}:news-3")
+    cache.set(f"celery:dedupe:{send_notification_email_task.name}:news-3:running", True)
+    with pytest.raises(Retry):
+        send_notification_email_task("admin@jota.info", "Assunto", "Mensagem", dedupe_key="news-3")
+
+    # A outra cópia terminou entre a checagem da marca e a reserva: a duplicata não roda
+    cache.delete(f"celery:dedupe:{send_notification_email_task.name}:news-3:running")
+    done_meanwhile = mocker.patch.object(cache, 'get', side_effect=[None, True])
+    sleep = mocker.patch('news_api.tasks.time.sleep')
+    assert send_notification_email_task("admin@jota.info", "Assunto", "Mensagem", dedupe_key="news-3") is None
+    sleep.assert_not_called()
+    assert done_meanwhile.call_count == 2
@@ -1,15 +1,29 @@
-from rest_framework import viewsets, permissions, status
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.utils import timezone
-from django.db.models import Q, F
+from django.db import transaction
 
-from .models import User, News, Vertical, Plan, UserPlan
+from .models import User, News, Vertical, Plan, UserPlan, RelatedNews, NewsRevision
 from .serializers import (
     UserSerializer, NewsSerializer, VerticalSerializer,
-    PlanSerializer, UserPlanSerializer
+    PlanSerializer, UserPlanSerializer, UserDirectorySerializer, UserDirectoryFilterSerializer,
+    NewsRevisionSerializer
 )
 from .permissions import IsAdminOrReadOnly, IsAdminUser, IsEditorOwnerOrAdminOrReadOnly
 from .tasks import send_notification_email_task
+from .outbox import enqueue_task
+from .entitlements import entitlement_for
+from .lifecycle import news_state, promote_due_scheduled_news, record_news_change
+from .revisions import get_revision_document
+from .news_counts import visible_news_count
+from .archive import archive_month_count, archive_months, month_bounds
+from .pagination import ApproximateCountPagination, PrecomputedCountPagination, UserDirectoryPagination
+from .sync import (
+    SYNC_MAX_PAGE_SIZE, SYNC_PAGE_SIZE, ExpiredSyncToken, InvalidSyncToken, changes_since
+)
+from .counters import (
+    MOST_READ_WINDOWS, DEFAULT_MOST_READ_WINDOW, get_most_read, reader_key_for, record_news_view
+)
 
 class UserViewSet(viewsets.ModelViewSet):
     """
@@ -21,6 +35,53 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser] # Apenas Admin gerencia usuários diretamente
 
+    def get_queryset(self):
+        # UserSerializer.get_plan lê assinatura, plano e verticais: tudo carregado de uma vez
+        return super().get_queryset().select_related('plan_subscription__plan').prefetch_related(
+            'plan_subscription__plan__allowed_verticals'
+        )
+
+    @action(detail=False, methods=['get'])
+    def directory(self, request):
+        """
+        Diretório de usuários paginado por cursor. Filtros: `role`, `plan` (id),
+        `is_active` e vencimento da assinatura (`expires_before`/`expires_after`).
+        Cada usuário traz só o id do plano; os planos da página vêm uma vez em `plans`.
+        """
+        filters = UserDirectoryFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+
+        users = User.objects.select_related('plan_subscription').only(
+            'id', 'username', 'email', 'role', 'is_staff', 'is_active',
+            'plan_subscription__plan_id', 'plan_subscription__start_date', 'plan_subscription__end_date',
+        )
+        if 'role' in params:
+            users = users.filter(role=params['role'])
+        if params.get('is_active') is not None:
+            users = users.filter(is_active=params['is_active'])
+        if 'plan' in params:
+            users = users.filter(plan_subscription__plan_id=params['plan'])
+        if 'expires_before' in params:
+            users = users.filter(plan_subscription__end_date__lt=params['expires_before'])
+        if 'expires_after' in params:
+            users = users.filter(plan_subscription__end_date__gte=params['expires_after'])
+
+        paginator = UserDirectoryPagination()
+        page = paginator.paginate_queryset(users, request, view=self)
+
+        # Cada plano (e suas verticais) é carregado e serializado uma vez por página
+        plan_ids = set()
+        for user in page:
+            subscription = getattr(user, 'plan_subscription', None)
+            if subscription is not None:
+                plan_ids.add(subscription.plan_id)
+        plans = Plan.objects.filter(id__in=plan_ids).prefetch_related('allowed_verticals') if plan_ids else []
+
+        response = paginator.get_paginated_response(UserDirectorySerializer(page, many=True).data)
+        response.data['plans'] = {str(plan.id): PlanSerializer(plan).data for plan in plans}
+        return response
+
 class VerticalViewSet(viewsets.ModelViewSet):
     """
     API endpoint para gerenciar Verticais.
@@ -55,76 +116,274 @@ class NewsViewSet(viewsets.ModelViewSet):
     - Editors: Criar notícias, Editar/Deletar apenas as suas.
     - Leitores: Ler notícias publicadas/agendadas (filtragem adicional necessária).
     - Não autenticados: Ler notícias publicadas não-PRO.
+
+    A listagem (GET /api/news/) responde com a lista simples de notícias, como
+    sempre. A paginação é opcional: com `?page=N` a resposta passa a ser
+    `{count, next, previous, results}`, 20 notícias por página. `count` é
+    informativo (contagens pré-calculadas ou estimativa) e pode ficar um pouco
+    atrás do real; para percorrer as páginas, siga `next` até ele ser nulo.
     """
     queryset = News.objects.all() # Queryset base, será filtrado
     serializer_class = NewsSerializer
     permission_classes = [IsEditorOwnerOrAdminOrReadOnly] # Combina permissões
+    pagination_class = ApproximateCountPagination
 
     def get_queryset(self):
         """
         Filtra as notícias com base no usuário e status.
         - Admins/Editors veem tudo (incluindo rascunhos).
-        - Leitores autenticados veem publicadas/agendadas (lógica de plano será adicionada).
-        - Não autenticados veem apenas publicadas não-PRO.
+        - Leitores PRO veem publicadas abertas ou PRO das verticais do seu plano.
+        - Demais leitores e não autenticados veem apenas publicadas não-PRO.
         """
-        user = self.request.user
-
         # Atualizar status de notícias agendadas que já passaram da hora
-        News.objects.filter(
-            status=News.Status.SCHEDULED,
-            scheduled_publish_date__lte=timezone.now()
-        ).update(status=News.Status.PUBLISHED, publication_date=F('scheduled_publish_date'), scheduled_publish_date=None)
-
-
-        if user.is_authenticated:
-            if user.role == User.Role.ADMIN or user.role == User.Role.EDITOR:
-                # Admins e Editores podem ver todos os status
-                return News.objects.all().order_by('-publication_date')
-            elif user.role == User.Role.READER:
-                # Leitores veem publicadas (ou agendadas que já deveriam estar publicadas)
-                # Lógica de plano PRO será adicionada aqui ou na permissão de objeto
-                allowed_statuses = [News.Status.PUBLISHED]
-                q_objects = Q(status__in=allowed_statuses)
-
-                try:
-                    user_plan_sub = user.plan_subscription
-                    plan = user_plan_sub.plan
-                    if plan.is_pro_plan:
-                        # Leitor PRO: vê publicadas (abertas OU PRO das suas verticais)
-                        allowed_vertical_ids = plan.allowed_verticals.values_list('id', flat=True)
-                        q_objects &= (Q(is_pro=False) | Q(verticals__id__in=allowed_vertical_ids))
-                        # Usar distinct() para evitar duplicatas se notícia pertence a múltiplas verticais permitidas
-                        return News.objects.filter(q_objects).distinct().order_by('-publication_date')
-                    else:
-                        # Leitor não-PRO (JOTA Info): vê apenas publicadas e não-PRO
-                        q_objects &= Q(is_pro=False)
-                        return News.objects.filter(q_objects).order_by('-publication_date')
-                except UserPlan.DoesNotExist:
-                     # Leitor sem plano associado: vê apenas publicadas e não-PRO
-                    q_objects &= Q(is_pro=False)
-                    return News.objects.filter(q_objects).order_by('-publication_date')
-
-        # Usuários não autenticados: veem apenas publicadas e não-PRO
-        return News.objects.filter(status=News.Status.PUBLISHED, is_pro=False).order_by('-publication_date')
+        promote_due_scheduled_news()
 
+        entitlement = entitlement_for(self.request.user)
+        return entitlement.filter_news(News.objects.all()).order_by('-publication_date')
+
+    def paginate_queryset(self, queryset):
+        """
+        Pagina só quando o cliente pede (`?page=`); sem o parâmetro, lista simples.
+        Total da listagem padrão vem das contagens por classe de acesso (news_counts.py);
+        qualquer outro queryset (ou contagens indisponíveis) usa a estimativa da paginação.
+        O total nunca limita as linhas retornadas (veja pagination.LookaheadPaginator).
+        """
+        if self.paginator is None or self.paginator.page_query_param not in self.request.query_params:
+            return None
+        count = None
+        if self.action == 'list' and not self.filter_backends:
+            count = visible_news_count(entitlement_for(self.request.user))
+        return self.paginator.paginate_queryset(queryset, self.request, view=self, count=count)
 
     def perform_create(self, serializer):
         if not (self.request.user.role == User.Role.ADMIN or self.request.user.role == User.Role.EDITOR):
              from rest_framework.exceptions import PermissionDenied
              raise PermissionDenied("Apenas Admins ou Editores podem criar notícias.")
 
-        news_instance = serializer.save()
+        # A notícia e a task de notificação são gravadas na mesma transação;
+        # o relay da outbox publica a task no Celery só depois do commit.
+        with transaction.atomic():
+            news_instance = serializer.save()
+
+            if news_instance.status == News.Status.PUBLISHED:
+                subject = f"Nova Notícia Publicada: {news_instance.title}"
+                message = f"A notícia '{news_instance.title}' foi publicada. Veja em /api/news/{news_instance.id}/"
+                # Simula envio para um admin ou lista de e-mails
+                admin_email = "admin@jota.info"
+                # A dedupe_key evita e-mail duplicado se o relay publicar a mensagem mais de uma vez
+                enqueue_task(
+                    send_notification_email_task.name,
+                    args=[admin_email, subject, message],
+                    kwargs={'dedupe_key': f"news-published:{news_instance.id}"},
+                )
+                # As relacionadas são calculadas em lote pela task periódica (veja related.py)
+
+    def perform_update(self, serializer):
+        # Texto/verticais alterados: refresh_related_news_task recalcula as relacionadas
+        # na próxima execução, a partir do updated_at
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            before = news_state(instance)
+            news_id = instance.id
+            instance.delete()
+            record_news_change(news_id, before, None)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        # Só leituras de notícias publicadas contam; o incremento vai para o Redis
+        if instance.status == News.Status.PUBLISHED:
+            record_news_view(instance.id, reader_key_for(request))
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='most-read')
+    def most_read(self, request):
+        """
+        Notícias mais lidas na janela (`window`: 1h, 6h ou 24h), opcionalmente de uma
+        vertical (`vertical`: slug). Servido a partir dos rankings pré-calculados,
+        filtrado pelo que o usuário pode ver.
+        """
+        window = request.query_params.get('window', DEFAULT_MOST_READ_WINDOW)
+        if window not in MOST_READ_WINDOWS:
+            return Response(
+                {'detail': f"Janela inválida. Use uma de: {', '.join(MOST_READ_WINDOWS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        vertical_id, error = self._vertical_from_query(request)
+        if error:
+            return error
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+
+        ranking = get_most_read(window, vertical_id)
+        views_by_id = dict(ranking)
+        visible = {
+            news.id: news
+            for news in self.get_queryset()
+            .filter(id__in=views_by_id)
+            .select_related('author')
+            .prefetch_related('verticals')
+        }
+        top = [visible[news_id] for news_id, _ in ranking if news_id in visible][:limit]
 
-        # Chama a task assíncrona após criar a notícia
-        if news_instance.status == News.Status.PUBLISHED:
-            subject = f"Nova Notícia Publicada: {news_instance.title}"
-            message = f"A notícia '{news_instance.title}' foi publicada. Veja em /api/news/{news_instance.id}/"
-            # Simula envio para um admin ou lista de e-mails
-            admin_email = "admin@jota.info"
-            # Usa .delay() para enviar a task para a fila do Celery
-            send_notification_email_task.delay(admin_email, subject, message)
-            print(f"Task de notificação para '{news_instance.title}' enviada para a fila.")
+        data = self.get_serializer(top, many=True).data
+        for item in data:
+            item['window_views'] = views_by_id[item['id']]
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Sincronização incremental: notícias alteradas e ids removidos desde `since`
+        (token devolvido em `next` pela chamada anterior; vazio = desde o início).
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', SYNC_PAGE_SIZE)), 1), SYNC_MAX_PAGE_SIZE)
+        except ValueError:
+            limit = SYNC_PAGE_SIZE
+        try:
+            changed, removed, next_token, has_more = changes_since(
+                self.get_queryset(), request.query_params.get('since'), limit
+            )
+        except InvalidSyncToken as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ExpiredSyncToken as e:
+            return Response({'detail': str(e)}, status=status.HTTP_410_GONE)
+
+        return Response({
+            'changed': self.get_serializer(changed, many=True).data,
+            'removed': removed,
+            'next': next_token,
+            'has_more': has_more,
+        })
+
+    @action(detail=False, methods=['get'], url_path='archive')
+    def archive(self, request):
+        """
+        Meses com notícias publicadas visíveis para o usuário, com a contagem de
+        cada um (opcionalmente de uma vertical: `vertical`=slug).
+        """
+        vertical_id, error = self._vertical_from_query(request)
+        if error:
+            return error
+        return Response(archive_months(entitlement_for(request.user), vertical_id))
+
+    @action(detail=False, methods=['get'], url_path=r'archive/(?P<year>\d{4})/(?P<month>\d{1,2})')
+    def archive_month(self, request, year, month):
+        """
+        Notícias publicadas no mês (paginadas), opcionalmente de uma vertical.
+        O total da paginação vem das contagens pré-calculadas do arquivo (atualizadas
+        de forma assíncrona); as linhas e o link da próxima página vêm da consulta.
+        """
+        year, month = int(year), int(month)
+        if not 1 <= month <= 12:
+            return Response({'detail': "Mês inválido."}, status=status.HTTP_404_NOT_FOUND)
+        vertical_id, error = self._vertical_from_query(request)
+        if error:
+            return error
+
+        start, end = month_bounds(year, month)
+        entitlement = entitlement_for(request.user)
+        queryset = (
+            self.get_queryset()
+            .filter(status=News.Status.PUBLISHED, publication_date__gte=start, publication_date__lt=end)
+            .select_related('author')
+            .prefetch_related('verticals')
+        )
+        if vertical_id is not None:
+            queryset = queryset.filter(verticals__id=vertical_id)
+
+        paginator = PrecomputedCountPagination()
+        page = paginator.paginate_queryset(
+            queryset, request, view=self, count=archive_month_count(entitlement, year, month, vertical_id)
+        )
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def _vertical_from_query(self, request):
+        vertical_slug = request.query_params.get('vertical')
+        if not vertical_slug:
+            return None, None
+        vertical_id = Vertical.objects.filter(slug=vertical_slug).values_list('id', flat=True).first()
+        if vertical_id is None:
+            return None, Response({'detail': "Vertical não encontrada."}, status=status.HTTP_404_NOT_FOUND)
+        return vertical_id, None
+
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """
+        Notícias relacionadas pré-calculadas, filtradas pelo que o usuário pode ver.
+        """
+        news = self.get_object()
+        related_ids = list(
+            RelatedNews.objects.filter(news=news).order_by('rank').values_list('related_id', flat=True)
+        )
+        visible = {
+            item.id: item
+            for item in self.get_queryset()
+            .filter(id__in=related_ids)
+            .select_related('author')
+            .prefetch_related('verticals')
+        }
+        related = [visible[related_id] for related_id in related_ids if related_id in visible]
+        return Response(self.get_serializer(related, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def revisions(self, request, pk=None):
+        """
+        Histórico de revisões da notícia (só metadados), da mais recente para a mais antiga.
+        Restrito a quem edita (Admins/Editores).
+        """
+        news = self.get_object()
+        if not entitlement_for(request.user).sees_all:
+            return Response({'detail': "Apenas editores podem ver o histórico."}, status=status.HTTP_403_FORBIDDEN)
+        revisions = NewsRevision.objects.filter(news=news).select_related('author').defer('data').order_by('-number')
+        return Response(NewsRevisionSerializer(revisions, many=True).data)
+
+    @action(detail=True, methods=['get'], url_path=r'revisions/(?P<number>\d+)')
+    def revision(self, request, pk=None, number=None):
+        """
+        Conteúdo completo (reconstruído) de uma revisão.
+        """
+        news = self.get_object()
+        if not entitlement_for(request.user).sees_all:
+            return Response({'detail': "Apenas editores podem ver o histórico."}, status=status.HTTP_403_FORBIDDEN)
+        revision = NewsRevision.objects.filter(news=news, number=number).select_related('author').defer('data').first()
+        if revision is None:
+            return Response({'detail': "Revisão não encontrada."}, status=status.HTTP_404_NOT_FOUND)
+        data = NewsRevisionSerializer(revision).data
+        data['document'] = get_revision_document(news.id, revision.number)
+        return Response(data)
+
+    @action(detail=True, methods=['post'], url_path=r'revisions/(?P<number>\d+)/restore')
+    def restore_revision(self, request, pk=None, number=None):
+        """
+        Restaura a notícia para uma revisão. A restauração passa pelo fluxo normal
+        de edição (permissões do autor/admin, ciclo de vida) e vira uma nova revisão.
+        """
+        news = self.get_object() # Checa a permissão de escrita (autor Editor ou Admin)
+        document = get_revision_document(news.id, int(number))
+        if document is None:
+            return Response({'detail': "Revisão não encontrada."}, status=status.HTTP_404_NOT_FOUND)
 
+        # Verticais removidas desde a revisão são ignoradas
+        existing = set(Vertical.objects.filter(id__in=document['verticals']).values_list('id', flat=True))
+        serializer = self.get_serializer(news, data={
+            'title': document['title'],
+            'subtitle': document['subtitle'],
+            'content': document['content'],
+            'status': document['status'],
+            'vertical_ids': [vertical_id for vertical_id in document['verticals'] if vertical_id in existing],
+        }, partial=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        return Response(serializer.data)
 
     def get_serializer_context(self):
         """ Passa o request para o serializer """